@@ -9,6 +9,8 @@ import sys
 import re
 import json
 import argparse
+import functools
+import random
 import readline
 import shutil
 import subprocess
@@ -28,8 +30,6 @@ from rich.markdown import Markdown
 from rich.live import Live
 from rich.text import Text
 from rich.style import Style
-from prompt_toolkit import prompt as pt_prompt
-from prompt_toolkit.history import FileHistory
 
 # Load environment variables
 load_dotenv()
@@ -44,6 +44,13 @@ MAX_RETRIES = 5
 INITIAL_RETRY_DELAY = 1  # Initial delay in seconds
 MAX_RETRY_DELAY = 60  # Maximum delay in seconds
 
+# Model listing is interactive, so it makes fewer attempts (counting the
+# first) with shorter delays, and doesn't retry timeouts
+MODELS_FETCH_RETRIES = 3
+MODELS_FETCH_RETRY_DELAY = 0.3  # Initial delay in seconds
+MODELS_FETCH_MAX_RETRY_DELAY = 5  # Cap on a server-requested Retry-After
+MODELS_RESPONSE_MAX_BYTES = 2_000_000  # Larger bodies are not a model list
+
 # Recoverable HTTP status codes
 RECOVERABLE_HTTP_CODES = {429, 500, 502, 503, 504}
 
@@ -233,8 +240,10 @@ class PluginManager:
         plugin_name = plugin_path.stem
         
         try:
-            # Load the plugin module
-            spec = importlib.util.spec_from_file_location(plugin_name, plugin_path)
+            # Load the plugin module under its package name so functions it
+            # defines can be pickled (e.g. for process pools)
+            module_name = f"{self.plugins_dir.name}.{plugin_name}"
+            spec = importlib.util.spec_from_file_location(module_name, plugin_path)
             if spec is None or spec.loader is None:
                 raise ImportError(f"Could not load spec for {plugin_name}")
             
@@ -244,7 +253,12 @@ class PluginManager:
             for key, value in self.context.items():
                 setattr(module, key, value)
             
-            spec.loader.exec_module(module)
+            sys.modules[module_name] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                sys.modules.pop(module_name, None)
+                raise
             
             # Check for required register_tools function
             if not hasattr(module, 'register_tools'):
@@ -318,19 +332,38 @@ LLODE_ROOT = Path(__file__).parent.resolve()
 PLUGINS_DIR = LLODE_ROOT / "tools"
 
 
+_log_fh = None
+
+
+def _get_log_file():
+    """Return the session's log file handle, opening it on first use.
+    
+    The handle stays open in append mode with a large buffer so logging a
+    turn doesn't cost an open/write/close cycle; it is flushed on exit.
+    """
+    global _log_fh
+    if _log_fh is None:
+        import atexit
+        
+        # Ensure .llode directory exists
+        LOG_FILE.parent.mkdir(exist_ok=True)
+        
+        _log_fh = open(LOG_FILE, "a", encoding="utf-8", buffering=64 * 1024)
+        atexit.register(_log_fh.close)
+    return _log_fh
+
+
 def log_conversation(role: str, content: str) -> None:
     """Log a conversation message to .llode/log.md"""
     from datetime import datetime
     
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    # Ensure .llode directory exists
-    LOG_FILE.parent.mkdir(exist_ok=True)
-    
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"\n---\n\n")
-        f.write(f"**{role.upper()}** ({timestamp})\n\n")
-        f.write(f"{content}\n")
+    _get_log_file().write(
+        f"\n---\n\n"
+        f"**{role.upper()}** ({timestamp})\n\n"
+        f"{content}\n"
+    )
 
 
 def log_session_start() -> None:
@@ -339,13 +372,11 @@ def log_session_start() -> None:
     
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    # Ensure .llode directory exists
-    LOG_FILE.parent.mkdir(exist_ok=True)
-    
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"\n\n{'='*80}\n")
-        f.write(f"# NEW SESSION - {timestamp}\n")
-        f.write(f"{'='*80}\n")
+    _get_log_file().write(
+        f"\n\n{'='*80}\n"
+        f"# NEW SESSION - {timestamp}\n"
+        f"{'='*80}\n"
+    )
 
 
 def check_pandoc_installed() -> bool:
@@ -730,8 +761,44 @@ def fetch_available_models(base_url: str, api_key: str) -> List[Dict[str, str]]:
             "Authorization": f"Bearer {api_key}"
         }
         
-        response = requests.get(models_url, headers=headers, timeout=10)
-        response.raise_for_status()
+        # Retry rate limits, server errors and failed connections with
+        # exponential backoff plus jitter, or the server's Retry-After. A read
+        # timeout already cost the full timeout, so it is not retried
+        # (requests' ConnectTimeout is a ConnectionError and is)
+        last_attempt = MODELS_FETCH_RETRIES - 1
+        for attempt in range(MODELS_FETCH_RETRIES):
+            try:
+                response = requests.get(models_url, headers=headers, timeout=10)
+                response.raise_for_status()
+                break
+            except HTTPError as e:
+                if (e.response is None
+                        or e.response.status_code not in RECOVERABLE_HTTP_CODES
+                        or attempt == last_attempt):
+                    raise
+                delay = MODELS_FETCH_RETRY_DELAY * 2 ** attempt + random.uniform(0, 0.1)
+                retry_after = e.response.headers.get('Retry-After')
+                if retry_after:
+                    try:
+                        delay = min(int(retry_after), MODELS_FETCH_MAX_RETRY_DELAY)
+                    except ValueError:
+                        pass  # HTTP-date form; keep the calculated delay
+            except (ConnectionError, ConnectionResetError, BrokenPipeError):
+                if attempt == last_attempt:
+                    raise
+                delay = MODELS_FETCH_RETRY_DELAY * 2 ** attempt + random.uniform(0, 0.1)
+            
+            time.sleep(delay)
+        
+        # Don't try to parse HTML error pages or oversized bodies as JSON
+        content_type = response.headers.get('content-type', '')
+        if 'json' not in content_type:
+            print(f"Warning: Unexpected response from models endpoint (Content-Type: {content_type or 'none'})")
+            return []
+        content_length = response.headers.get('content-length', '')
+        if content_length.isdigit() and int(content_length) > MODELS_RESPONSE_MAX_BYTES:
+            print(f"Warning: Models response too large ({int(content_length):,} bytes)")
+            return []
         
         # Parse the response
         data = response.json()
@@ -758,15 +825,24 @@ def fetch_available_models(base_url: str, api_key: str) -> List[Dict[str, str]]:
         return []
 
 
+@functools.lru_cache(maxsize=8)
+def format_models_listing(model_ids: Tuple[str, ...], current_model: str) -> str:
+    """Format the numbered /model listing, marking the current model."""
+    lines = []
+    for i, model_id in enumerate(model_ids, 1):
+        marker = " [cyan](current)[/cyan]" if model_id == current_model else ""
+        lines.append(f"  {i}. {model_id}{marker}")
+    return "\n".join(lines)
+
+
 def manage_context(messages: List[Dict], max_tokens: int) -> List[Dict]:
     """Trim old messages to stay within context limit."""
     total_chars = sum(len(m.get('content', '')) for m in messages)
-    estimated_tokens = total_chars // 4
     
-    while estimated_tokens > max_tokens and len(messages) > 2:
-        messages.pop(1)
-        total_chars = sum(len(m.get('content', '')) for m in messages)
-        estimated_tokens = total_chars // 4
+    # Trim in place, keeping the system prompt at index 0 and a running total
+    # so long conversations aren't re-summed after every pop
+    while total_chars // 4 > max_tokens and len(messages) > 2:
+        total_chars -= len(messages.pop(1).get('content', ''))
     
     return messages
 
@@ -966,13 +1042,25 @@ def get_multiline_input(console: Console) -> str:
     return '\n'.join(lines)
 
 
+def get_env_defaults() -> Dict[str, Optional[str]]:
+    """Snapshot API settings from the environment (and .env) in one place."""
+    env = os.environ
+    return {
+        "base_url": env.get("OPENAI_BASE_URL", DEFAULT_BASE_URL),
+        "api_key": env.get("OPENAI_API_KEY"),
+        "model": env.get("MODEL_NAME", DEFAULT_MODEL),
+    }
+
+
 def main():
+    defaults = get_env_defaults()
+    
     parser = argparse.ArgumentParser(description="LLM CLI Coding Assistant")
-    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL),
+    parser.add_argument("--base-url", default=defaults["base_url"],
                        help="API base URL")
-    parser.add_argument("--api-key", default=os.getenv("OPENAI_API_KEY"),
+    parser.add_argument("--api-key", default=defaults["api_key"],
                        help="API key")
-    parser.add_argument("--model", default=os.getenv("MODEL_NAME", DEFAULT_MODEL),
+    parser.add_argument("--model", default=defaults["model"],
                        help="Model name")
     parser.add_argument("--max-tokens", type=int, default=MAX_CONTEXT_TOKENS,
                        help="Maximum context tokens")
@@ -1005,6 +1093,8 @@ def main():
         sys.exit(1)
     
     console = Console()
+    # Blank lines and banners are only cosmetic; skip them for piped output
+    is_tty = sys.stdout.isatty()
     
     # Initialize plugin system
     plugin_manager = PluginManager(PLUGINS_DIR, GIT_ROOT)
@@ -1051,7 +1141,8 @@ def main():
         )
         
         log_conversation("assistant", response)
-        console.print()  # Final newline
+        if is_tty:
+            console.print()  # Final newline
         sys.exit(0)
     
     # Interactive mode
@@ -1060,6 +1151,11 @@ def main():
     console.print(f"[dim]Project root: {GIT_ROOT}[/dim]")
     console.print("[dim]Commands: /help, /clear, /model, /plan, /plugins, /multiline, /undo, /quit[/dim]\n")
     
+    # prompt_toolkit is only needed for the interactive loop, so don't pay for
+    # importing it on --help, --list-models or single prompt runs
+    from prompt_toolkit import prompt as pt_prompt
+    from prompt_toolkit.history import FileHistory
+    
     # Setup history
     history_file = Path.home() / ".llode_history"
     history = FileHistory(str(history_file))
@@ -1080,7 +1176,8 @@ def main():
                 cmd = user_input[1:].lower().split()[0]
                 
                 if cmd in ('quit', 'exit', 'q'):
-                    console.print("[yellow]Goodbye![/yellow]")
+                    if is_tty:
+                        console.print("[yellow]Goodbye![/yellow]")
                     break
                 elif cmd == 'help':
                     console.print("""
@@ -1105,10 +1202,8 @@ def main():
                     
                     if models:
                         console.print(f"\n[bold]Available models ({len(models)}):[/bold]")
-                        for i, model in enumerate(models, 1):
-                            owner = model.get('owned_by', 'unknown')
-                            marker = " [cyan](current)[/cyan]" if model['id'] == current_model else ""
-                            console.print(f"  {i}. {model['id']}{marker}")
+                        model_ids = tuple(m['id'] for m in models)
+                        console.print(format_models_listing(model_ids, current_model))
                         
                         console.print("\nEnter model number or name (or press Enter to cancel): ", end="")
                         choice = input().strip()
@@ -1150,7 +1245,7 @@ def main():
                         console.print("[green]File editing is now enabled.[/green]\n")
                     continue
                 elif cmd == 'clear':
-                    messages = [{"role": "system", "content": system_prompt}]
+                    del messages[1:]
                     console.print("[green]Conversation history cleared[/green]\n")
                     continue
                 elif cmd == 'multiline':
@@ -1284,7 +1379,7 @@ def main():
             
             log_conversation("user", user_input)
             messages.append({"role": "user", "content": user_input})
-            messages = manage_context(messages, args.max_tokens)
+            manage_context(messages, args.max_tokens)
             
             console.print("\n[bold blue]Assistant:[/bold blue]")
             
@@ -1300,13 +1395,15 @@ def main():
             log_conversation("assistant", response)
             messages.append({"role": "assistant", "content": response})
             
-            console.print()
+            if is_tty:
+                console.print()
             
         except KeyboardInterrupt:
             console.print("\n[yellow]Use /quit to exit[/yellow]")
             continue
         except EOFError:
-            console.print("\n[yellow]Goodbye![/yellow]")
+            if is_tty:
+                console.print("\n[yellow]Goodbye![/yellow]")
             break
         except Exception as e:
             console.print(f"\n[red]Error: {str(e)}[/red]\n")
@@ -0,0 +1,122 @@
+"""
+Conversion cache helper for the document conversion plugin.
+
+Not a plugin itself (private modules are skipped by the plugin loader).
+
+Caches converted output keyed by the converting tool, its version, the
+flags used and the SHA-256 of the input bytes, so converting an unchanged
+document again skips the external process entirely. Entries are evicted
+least-recently-used once the cache grows past its size budget.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+# Total size of cached outputs before the least recently used are evicted
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(tool: str) -> str:
+    """Return the first line of a tool's version output ('' if unavailable)."""
+    try:
+        result = subprocess.run([tool, "--version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    # pdftotext prints its version to stderr
+    output = result.stdout or result.stderr
+    return output.splitlines()[0] if output else ""
+
+
+class ConversionCache:
+    """LRU cache of converted files stored under a cache directory."""
+    
+    def __init__(self, cache_dir: Path, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = cache_dir / "index.json"
+        # Guards index.json; conversions themselves run unlocked
+        self.lock = threading.Lock()
+    
+    def key_for(self, tool: str, flags: List[str], source: Path) -> str:
+        """Build a cache key from the tool, its version, flags and input bytes."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([tool, tool_version(tool), flags]).encode())
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def get_or_run(self, key: str, output_path: Path, producer: Callable[[], Optional[str]]) -> Optional[str]:
+        """Fill output_path from the cache, or run producer to create it.
+        
+        producer writes output_path and returns an error message on failure
+        (or None on success); only successful outputs are cached. Returns
+        producer's error message, or None.
+        """
+        cached_file = self.cache_dir / f"{key}.md"
+        
+        with self.lock:
+            index = self._load_index()
+            if key in index and cached_file.exists():
+                # Copy rather than hardlink: the output is meant to be edited
+                shutil.copyfile(cached_file, output_path)
+                index[key]['atime'] = time.time()
+                self._save_index(index)
+                return None
+        
+        error = producer()
+        if error:
+            return error
+        
+        with self.lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(output_path, cached_file)
+            index = self._load_index()
+            index[key] = {'atime': time.time(), 'size': cached_file.stat().st_size}
+            self._evict(index)
+            self._save_index(index)
+        return None
+    
+    def _evict(self, index: Dict[str, dict]):
+        """Drop least recently used entries until the cache fits its budget."""
+        total = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['atime']):
+            if total <= self.max_bytes:
+                break
+            total -= index.pop(key)['size']
+            try:
+                (self.cache_dir / f"{key}.md").unlink()
+            except FileNotFoundError:
+                pass
+    
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_index(self, index: Dict[str, dict]):
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_path.parent, prefix=f".{self.index_path.name}.")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
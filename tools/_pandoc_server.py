@@ -0,0 +1,191 @@
+"""
+Pandoc server client for the document conversion plugin.
+
+Not a plugin itself (private modules are skipped by the plugin loader).
+
+Starting pandoc costs a few hundred milliseconds of runtime initialisation
+per call. This keeps one `pandoc server` process running on a loopback
+port, started lazily on first use, and sends conversions to it over a
+keep-alive HTTP connection per thread, so conversions can run
+concurrently. Callers fall back to running pandoc directly when the
+server is unavailable (e.g. pandoc older than 2.19).
+"""
+
+import atexit
+import base64
+import http.client
+import json
+import re
+import socket
+import subprocess
+import threading
+import time
+from typing import Optional
+
+from ._conv_cache import tool_version
+
+
+PANDOC_SERVER_MIN_VERSION = (2, 19)
+SERVER_START_TIMEOUT = 5
+CONVERSION_TIMEOUT = 30
+
+# Pandoc format names by file extension
+PANDOC_FORMATS = {
+    '.md': 'markdown',
+    '.docx': 'docx',
+    '.odt': 'odt',
+    '.rtf': 'rtf',
+    '.html': 'html',
+    '.htm': 'html',
+    '.epub': 'epub',
+    '.rst': 'rst',
+    '.latex': 'latex',
+    '.tex': 'latex',
+}
+
+# Formats the server exchanges as base64
+BINARY_FORMATS = {'docx', 'odt', 'epub'}
+
+
+class PandocServerError(Exception):
+    """Raised when the server can't be used for a conversion."""
+
+
+class PandocServer:
+    """Lazily started `pandoc server` process with a keep-alive client."""
+    
+    def __init__(self):
+        self.proc = None
+        self.port = None
+        self._local = threading.local()
+        self._conns = []
+        # Bumped on each start, so threads drop connections to an old server
+        self._generation = 0
+        self._failed = False
+        self.lock = threading.Lock()
+        atexit.register(self.stop)
+    
+    def available(self) -> bool:
+        """Start the server if needed; False if it can't be used."""
+        with self.lock:
+            if self.proc is not None and self.proc.poll() is None:
+                return True
+            if self._failed:
+                return False
+            try:
+                self._start()
+                return True
+            except (OSError, PandocServerError):
+                self._failed = True
+                self.stop()
+                return False
+    
+    def _start(self):
+        match = re.search(r'(\d+)\.(\d+)', tool_version("pandoc"))
+        if not match or tuple(map(int, match.groups())) < PANDOC_SERVER_MIN_VERSION:
+            raise PandocServerError("pandoc server requires pandoc 2.19 or newer")
+        
+        # pandoc server can't report an ephemeral port, so pick a free one
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        
+        self.proc = subprocess.Popen(
+            ["pandoc", "server", f"--port={self.port}", f"--timeout={CONVERSION_TIMEOUT}"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self._generation += 1
+        
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise PandocServerError("pandoc server exited on startup")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise PandocServerError("pandoc server did not start in time")
+    
+    def convert(self, from_fmt: str, to_fmt: str, data: bytes) -> bytes:
+        """Convert a document, returning the output bytes."""
+        if from_fmt in BINARY_FORMATS:
+            text = base64.b64encode(data).decode('ascii')
+        else:
+            try:
+                text = data.decode('utf-8')
+            except UnicodeDecodeError as e:
+                raise PandocServerError(f"input is not UTF-8: {e}")
+        
+        body = json.dumps({'text': text, 'from': from_fmt, 'to': to_fmt})
+        
+        status, payload = self._post(body)
+        
+        if status != 200:
+            raise PandocServerError(payload.decode('utf-8', errors='replace'))
+        
+        result = json.loads(payload)
+        if result.get('error'):
+            raise PandocServerError(result['error'])
+        
+        output = result.get('output', '')
+        if result.get('base64'):
+            return base64.b64decode(output)
+        return output.encode('utf-8')
+    
+    def _post(self, body: str):
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        
+        # Retry once on a fresh connection if the kept-alive one went stale
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is not None and self._local.generation != self._generation:
+                conn.close()
+                conn = None
+            if conn is None:
+                conn = http.client.HTTPConnection(
+                    "127.0.0.1", self.port, timeout=CONVERSION_TIMEOUT + 5
+                )
+                self._local.conn = conn
+                self._local.generation = self._generation
+                with self.lock:
+                    self._conns.append(conn)
+            try:
+                conn.request("POST", "/", body=body, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise PandocServerError(f"pandoc server request failed: {e}")
+    
+    def stop(self):
+        """Stop the server process and close the client connections."""
+        for conn in self._conns:
+            conn.close()
+        self._conns.clear()
+        if self.proc is not None:
+            if self.proc.poll() is None:
+                self.proc.terminate()
+                try:
+                    self.proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.proc.kill()
+            self.proc = None
+
+
+# Shared by every conversion in this process
+pandoc_server = PandocServer()
+
+
+def convert_with_server(from_fmt: Optional[str], to_fmt: Optional[str], data: bytes) -> Optional[bytes]:
+    """Convert through the server, or return None if the caller should run pandoc itself."""
+    if from_fmt is None or to_fmt is None or not pandoc_server.available():
+        return None
+    try:
+        return pandoc_server.convert(from_fmt, to_fmt, data)
+    except (PandocServerError, ValueError):
+        return None
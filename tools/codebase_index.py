@@ -11,13 +11,46 @@ and dependency analysis. Currently supports Python with plans for
 multi-language support.
 """
 
+import os
 import sqlite3
 import ast
+import atexit
+import functools
+import hashlib
+import pickle
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import groupby, repeat
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Iterator, Optional, Tuple, Any
 import json
 
 
+# Number of files indexed per transaction by index_codebase
+INDEX_COMMIT_BATCH = 200
+
+# Below this many files, starting worker processes costs more than it saves
+PARALLEL_PARSE_MIN_FILES = 64
+
+# Row inserts, fed with the tuples PythonSymbolExtractor collects (prefixed
+# with the file id)
+_SQL_INS_SYMBOL = """
+    INSERT INTO symbols (file_id, name, type, line_start, line_end, signature, docstring, parent_symbol)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+_SQL_INS_IMPORT = """
+    INSERT INTO imports (file_id, imported_path, imported_symbol, alias, line_number, module)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+_SQL_INS_REF = """
+    INSERT INTO "references" (file_id, symbol_name, line_number, context)
+    VALUES (?, ?, ?, ?)
+"""
+
+
 class CodeIndexer:
     """Manages semantic code indexing using SQLite."""
     
@@ -25,13 +58,49 @@ class CodeIndexer:
         self.git_root = git_root
         self.index_dir = git_root / ".llode"
         self.db_path = self.index_dir / "index.db"
+        self._conn: Optional[sqlite3.Connection] = None
+        # Tool handlers share one connection, so serialize access to it
+        self.lock = threading.RLock()
+        # False when SQLite lacks FTS5 or the trigram tokenizer (before 3.34)
+        self.fts_available = True
         self._ensure_db()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection to the index with tuned settings.
+        
+        WAL with synchronous=NORMAL avoids an fsync per commit and lets
+        queries run while the index is being written.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        return conn
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Long-lived connection to the index, opened on first use."""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+    
+    def close(self):
+        """Close the shared connection (it is reopened on next use)."""
+        if self._conn is not None:
+            try:
+                self._conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            self._conn.close()
+            self._conn = None
+    
     def _ensure_db(self):
         """Create database and tables if they don't exist."""
         self.index_dir.mkdir(exist_ok=True)
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self.conn
         cursor = conn.cursor()
         
         # Files table
@@ -42,9 +111,11 @@ class CodeIndexer:
                 language TEXT,
                 mtime REAL,
                 lines INTEGER,
-                size INTEGER
+                size INTEGER,
+                sha256 BLOB
             )
         """)
+        self._ensure_column(cursor, "files", "sha256", "BLOB")
         
         # Symbols table (functions, classes, variables)
         cursor.execute("""
@@ -71,9 +142,13 @@ class CodeIndexer:
                 imported_symbol TEXT,
                 alias TEXT,
                 line_number INTEGER,
+                module TEXT,
                 FOREIGN KEY(file_id) REFERENCES files(id)
             )
         """)
+        if self._ensure_column(cursor, "imports", "module", "TEXT"):
+            # Existing rows have no module yet, so make every file reindex
+            cursor.execute("UPDATE files SET mtime = 0, sha256 = NULL")
         
         # References table (where symbols are used)
         cursor.execute("""
@@ -87,105 +162,173 @@ class CodeIndexer:
             )
         """)
         
-        # Create indexes for faster queries
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name)")
+        # Full-text index over symbols, keyed by symbols.id. The trigram
+        # tokenizer lets LIKE patterns with leading wildcards use the index.
+        # Without FTS5 support, name patterns fall back to a plain LIKE scan
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'symbols_fts'")
+            if cursor.fetchone() is None:
+                cursor.execute("""
+                    CREATE VIRTUAL TABLE symbols_fts USING fts5(
+                        name, signature, docstring, path,
+                        tokenize = 'trigram'
+                    )
+                """)
+                # Populate it for files indexed before it existed
+                cursor.execute("UPDATE files SET mtime = 0, sha256 = NULL")
+            else:
+                # Fails if this SQLite lacks FTS5 but another one created the table
+                cursor.execute("SELECT rowid FROM symbols_fts LIMIT 0")
+            self.fts_available = True
+        except sqlite3.OperationalError:
+            self.fts_available = False
+        
+        # Create indexes for faster queries. The name lookups are composite
+        # so find_symbol can filter and order without touching table rows
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbols_name_type_file ON symbols(name, type, file_id, line_start)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbols_type ON symbols(type)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_imports_path ON imports(imported_path)")
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_references_symbol ON "references"(symbol_name)')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_imports_module ON imports(module)")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_refs_name_file_line ON "references"(symbol_name, file_id, line_number)')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_symbols_file ON symbols(file_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_imports_file ON imports(file_id)")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_references_file ON "references"(file_id)')
+        
+        # Superseded by the composite indexes above
+        cursor.execute("DROP INDEX IF EXISTS idx_symbols_name")
+        cursor.execute("DROP INDEX IF EXISTS idx_references_symbol")
         
         conn.commit()
-        conn.close()
     
-    def get_file_mtime(self, path: str) -> Optional[float]:
-        """Get stored modification time for a file."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT mtime FROM files WHERE path = ?", (path,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
+    @staticmethod
+    def _ensure_column(cursor: sqlite3.Cursor, table: str, column: str, decl: str) -> bool:
+        """Add a column to a table created by an older version of the index.
+        
+        Returns True if the column had to be added.
+        """
+        cursor.execute(f'PRAGMA table_info("{table}")')
+        if column in (row[1] for row in cursor.fetchall()):
+            return False
+        cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {decl}')
+        return True
+    
+    def get_file_states(self) -> Dict[str, Tuple[float, int, Optional[bytes]]]:
+        """Get stored (mtime, size, sha256) for all indexed files, keyed by path."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT path, mtime, size, sha256 FROM files")
+        return {path: (mtime, size, sha256) for path, mtime, size, sha256 in cursor.fetchall()}
     
-    def needs_indexing(self, path: Path) -> bool:
-        """Check if a file needs to be (re)indexed."""
-        rel_path = str(path.relative_to(self.git_root))
-        db_mtime = self.get_file_mtime(rel_path)
+    def needs_indexing(self, path: Path, db_state: Optional[Tuple[float, int, Optional[bytes]]]) -> bool:
+        """Check if a file needs to be (re)indexed given its stored state.
         
-        if db_mtime is None:
+        A newer mtime alone doesn't force a reparse: if the size and content
+        hash still match, only the stored mtime is refreshed.
+        """
+        if db_state is None:
             return True
         
-        disk_mtime = path.stat().st_mtime
-        return disk_mtime > db_mtime
-    
-    def index_python_file(self, path: Path):
-        """Index a Python file using AST."""
-        rel_path = str(path.relative_to(self.git_root))
+        db_mtime, db_size, db_sha256 = db_state
+        stat = path.stat()
+        if stat.st_mtime <= db_mtime:
+            return False
+        if stat.st_size != db_size or db_sha256 is None:
+            return True
+        if hashlib.sha256(path.read_bytes()).digest() != db_sha256:
+            return True
         
-        try:
-            content = path.read_text()
-            tree = ast.parse(content, filename=str(path))
-        except Exception as e:
+        # Touched but unchanged
+        in_batch = self.conn.in_transaction
+        self.conn.execute(
+            "UPDATE files SET mtime = ? WHERE path = ?",
+            (stat.st_mtime, str(path.relative_to(self.git_root)))
+        )
+        if not in_batch:
+            self.conn.commit()
+        return False
+    
+    def index_python_file(self, path: Path, conn: Optional[sqlite3.Connection] = None,
+                          collect_refs: bool = True):
+        """Index a Python file using AST.
+        
+        If conn is in a transaction, the file is written inside it (under a
+        savepoint) and the caller is responsible for committing. Otherwise
+        the file is committed on its own. Defaults to the shared connection.
+        """
+        self.write_parsed_file(_parse_python_file(str(path), str(self.git_root), collect_refs), conn)
+    
+    def write_parsed_file(self, parsed: Optional[tuple], conn: Optional[sqlite3.Connection] = None):
+        """Replace a file's rows with the output of _parse_python_file()."""
+        if parsed is None:
             # Can't parse, skip
             return
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Remove old data for this file
-        cursor.execute("DELETE FROM files WHERE path = ?", (rel_path,))
+        rel_path, mtime, lines, size, sha256, symbol_rows, import_rows, ref_rows = parsed
         
-        # Insert file record
-        lines = content.count('\n') + 1
-        size = len(content)
-        mtime = path.stat().st_mtime
-        
-        cursor.execute("""
-            INSERT INTO files (path, language, mtime, lines, size)
-            VALUES (?, ?, ?, ?, ?)
-        """, (rel_path, "python", mtime, lines, size))
-        
-        file_id = cursor.lastrowid
+        if conn is None:
+            conn = self.conn
         
-        # Extract symbols
-        extractor = PythonSymbolExtractor()
-        extractor.visit(tree)
-        
-        # Insert symbols
-        for symbol in extractor.symbols:
-            cursor.execute("""
-                INSERT INTO symbols (file_id, name, type, line_start, line_end, signature, docstring, parent_symbol)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (file_id, symbol['name'], symbol['type'], symbol['line_start'], 
-                  symbol['line_end'], symbol.get('signature'), symbol.get('docstring'),
-                  symbol.get('parent')))
-        
-        # Insert imports
-        for imp in extractor.imports:
-            cursor.execute("""
-                INSERT INTO imports (file_id, imported_path, imported_symbol, alias, line_number)
-                VALUES (?, ?, ?, ?, ?)
-            """, (file_id, imp.get('imported_path'), imp.get('imported_symbol'),
-                  imp.get('alias'), imp['line_number']))
-        
-        # Insert references
-        for ref in extractor.references:
+        # A savepoint starts (and RELEASE commits) a transaction when none
+        # is open and nests inside the caller's batch otherwise, so a failing
+        # file only rolls back its own rows
+        conn.execute("SAVEPOINT index_file")
+        try:
+            cursor = conn.cursor()
+            
+            # Remove old data for this file, including its symbols, imports
+            # and references so they don't linger or attach to a reused id
+            cursor.execute("SELECT id FROM files WHERE path = ?", (rel_path,))
+            old_file = cursor.fetchone()
+            if old_file:
+                old_id = old_file[0]
+                if self.fts_available:
+                    cursor.execute("""
+                        DELETE FROM symbols_fts
+                        WHERE rowid IN (SELECT id FROM symbols WHERE file_id = ?)
+                    """, (old_id,))
+                cursor.execute("DELETE FROM symbols WHERE file_id = ?", (old_id,))
+                cursor.execute("DELETE FROM imports WHERE file_id = ?", (old_id,))
+                cursor.execute('DELETE FROM "references" WHERE file_id = ?', (old_id,))
+                cursor.execute("DELETE FROM files WHERE id = ?", (old_id,))
+            
+            # Insert file record
             cursor.execute("""
-                INSERT INTO "references" (file_id, symbol_name, line_number, context)
-                VALUES (?, ?, ?, ?)
-            """, (file_id, ref['symbol_name'], ref['line_number'], ref.get('context', '')))
-        
-        conn.commit()
-        conn.close()
+                INSERT INTO files (path, language, mtime, lines, size, sha256)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (rel_path, "python", mtime, lines, size, sha256))
+            
+            file_id = cursor.lastrowid
+            
+            # Insert symbols
+            cursor.executemany(_SQL_INS_SYMBOL, ((file_id,) + row for row in symbol_rows))
+            
+            if self.fts_available:
+                cursor.execute("""
+                    INSERT INTO symbols_fts (rowid, name, signature, docstring, path)
+                    SELECT id, name, signature, docstring, ? FROM symbols WHERE file_id = ?
+                """, (rel_path, file_id))
+            
+            # Insert imports
+            cursor.executemany(_SQL_INS_IMPORT, ((file_id,) + row for row in import_rows))
+            
+            # Insert references
+            cursor.executemany(_SQL_INS_REF, ((file_id,) + row for row in ref_rows))
+            
+            conn.execute("RELEASE index_file")
+        except Exception:
+            conn.execute("ROLLBACK TO index_file")
+            conn.execute("RELEASE index_file")
+            raise
     
-    def index_file(self, path: Path):
+    def index_file(self, path: Path, conn: Optional[sqlite3.Connection] = None,
+                   collect_refs: bool = True):
         """Index a file based on its language."""
         if path.suffix == '.py':
-            self.index_python_file(path)
+            self.index_python_file(path, conn, collect_refs)
         # Future: add support for other languages
     
     def get_stats(self) -> Dict[str, Any]:
         """Get indexing statistics."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
         
         cursor.execute("SELECT COUNT(*) FROM files")
         file_count = cursor.fetchone()[0]
@@ -199,8 +342,6 @@ class CodeIndexer:
         cursor.execute("SELECT type, COUNT(*) FROM symbols GROUP BY type")
         by_type = dict(cursor.fetchall())
         
-        conn.close()
-        
         return {
             'files': file_count,
             'symbols': symbol_count,
@@ -209,80 +350,140 @@ class CodeIndexer:
         }
 
 
-class PythonSymbolExtractor(ast.NodeVisitor):
-    """Extract symbols, imports, and references from Python AST."""
+class PythonSymbolExtractor:
+    """Extract symbols, imports, and references from Python AST.
+    
+    Rows are collected as tuples in the column order of _SQL_INS_SYMBOL,
+    _SQL_INS_IMPORT and _SQL_INS_REF (without the leading file_id).
+    """
     
-    def __init__(self):
+    def __init__(self, module_name: str = "", collect_refs: bool = True):
         self.symbols = []
         self.imports = []
         self.references = []
+        self._ref_set = set()
         self.current_class = None
+        
+        # Package that relative imports are resolved against
+        if module_name.endswith('.__init__'):
+            self.package = module_name[:-len('.__init__')]
+        else:
+            self.package = module_name.rpartition('.')[0]
+        
+        # Handlers return whether the node's children should be walked
+        self._handlers = {
+            ast.FunctionDef: self.visit_FunctionDef,
+            ast.AsyncFunctionDef: self.visit_FunctionDef,
+            ast.ClassDef: self.visit_ClassDef,
+            ast.Import: self.visit_Import,
+            ast.ImportFrom: self.visit_ImportFrom,
+            # Leaves have nothing left to collect
+            ast.Name: self._skip,
+            ast.Constant: self._skip,
+        }
+        if collect_refs:
+            self._handlers[ast.Call] = self.visit_Call
+            self._handlers[ast.Attribute] = self.visit_Attribute
     
-    def visit_FunctionDef(self, node):
+    def walk(self, tree: ast.AST):
+        """Walk the tree depth-first with an explicit stack.
+        
+        Avoids ast.NodeVisitor's per-node method lookup and recursion, and
+        skips subtrees whose handler says there is nothing to collect.
+        """
+        handlers = self._handlers
+        stack = [(tree, None)]
+        
+        while stack:
+            node, self.current_class = stack.pop()
+            
+            handler = handlers.get(type(node))
+            if handler is not None and not handler(node):
+                continue
+            
+            # Class bodies are walked with the class as context
+            child_class = node.name if type(node) is ast.ClassDef else self.current_class
+            children = list(ast.iter_child_nodes(node))
+            children.reverse()  # Keep source order when popping
+            stack.extend([(child, child_class) for child in children])
+    
+    @staticmethod
+    def _skip(node) -> bool:
+        return False
+    
+    def visit_FunctionDef(self, node) -> bool:
         signature = self._get_signature(node)
         docstring = ast.get_docstring(node)
         
-        self.symbols.append({
-            'name': node.name,
-            'type': 'method' if self.current_class else 'function',
-            'line_start': node.lineno,
-            'line_end': node.end_lineno,
-            'signature': signature,
-            'docstring': docstring,
-            'parent': self.current_class
-        })
-        self.generic_visit(node)
-    
-    def visit_AsyncFunctionDef(self, node):
-        # Treat async functions same as regular functions
-        self.visit_FunctionDef(node)
-    
-    def visit_ClassDef(self, node):
+        self.symbols.append((
+            node.name,
+            'method' if self.current_class else 'function',
+            node.lineno,
+            node.end_lineno,
+            signature,
+            docstring,
+            self.current_class,
+        ))
+        return True
+    
+    def visit_ClassDef(self, node) -> bool:
         docstring = ast.get_docstring(node)
         
-        self.symbols.append({
-            'name': node.name,
-            'type': 'class',
-            'line_start': node.lineno,
-            'line_end': node.end_lineno,
-            'docstring': docstring,
-            'parent': None
-        })
-        
-        # Visit class body with class context
-        old_class = self.current_class
-        self.current_class = node.name
-        self.generic_visit(node)
-        self.current_class = old_class
-    
-    def visit_Import(self, node):
+        self.symbols.append((
+            node.name,
+            'class',
+            node.lineno,
+            node.end_lineno,
+            None,
+            docstring,
+            None,
+        ))
+        return True
+    
+    def visit_Import(self, node) -> bool:
         for alias in node.names:
-            self.imports.append({
-                'imported_path': alias.name,
-                'imported_symbol': None,
-                'alias': alias.asname,
-                'line_number': node.lineno
-            })
-    
-    def visit_ImportFrom(self, node):
+            self.imports.append((alias.name, None, alias.asname, node.lineno, alias.name))
+        return False
+    
+    def visit_ImportFrom(self, node) -> bool:
         module = node.module or ''
+        resolved = self._resolve_module(module, node.level)
         for alias in node.names:
-            self.imports.append({
-                'imported_path': module,
-                'imported_symbol': alias.name,
-                'alias': alias.asname,
-                'line_number': node.lineno
-            })
-    
-    def visit_Name(self, node):
-        # Track symbol references (when reading a name)
-        if isinstance(node.ctx, ast.Load):
-            self.references.append({
-                'symbol_name': node.id,
-                'line_number': node.lineno,
-                'context': ''  # Could extract surrounding code if needed
-            })
-        self.generic_visit(node)
+            self.imports.append((module, alias.name, alias.asname, node.lineno, resolved))
+        return False
+    
+    def _resolve_module(self, module: str, level: int) -> str:
+        """Resolve a (possibly relative) from-import to an absolute module name."""
+        if not level:
+            return module
+        parts = self.package.split('.') if self.package else []
+        if level > 1:
+            parts = parts[:-(level - 1)]
+        if module:
+            parts.append(module)
+        return '.'.join(parts)
+    
+    def visit_Call(self, node) -> bool:
+        # Track calls to plain names; calls through attributes are covered
+        # by visit_Attribute recording the chain's root name
+        if isinstance(node.func, ast.Name):
+            self._add_reference(node.func.id, node.func.lineno)
+        return True
+    
+    def visit_Attribute(self, node) -> bool:
+        # Track the root name of attribute chains (e.g. "os" in os.path.join)
+        if isinstance(node.value, ast.Name):
+            self._add_reference(node.value.id, node.value.lineno)
+        return True
+    
+    def _add_reference(self, name: str, line_number: int):
+        """Record a symbol reference once per name and line."""
+        key = (name, line_number)
+        if key in self._ref_set:
+            return
+        self._ref_set.add(key)
+        # Context could hold surrounding code if needed
+        self.references.append((name, line_number, ''))
     
     def _get_signature(self, node: ast.FunctionDef) -> str:
         """Extract function signature as string."""
@@ -318,67 +519,211 @@ class PythonSymbolExtractor(ast.NodeVisitor):
         return signature
 
 
+def _module_name(rel_path: Path) -> str:
+    """Dotted module name for a path relative to the repository root."""
+    parts = rel_path.with_suffix('').parts
+    if parts and parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts)
+
+
+def _parse_python_file(path_str: str, git_root_str: str, collect_refs: bool = True) -> Optional[tuple]:
+    """Read, parse and extract a Python file into rows ready for insertion.
+    
+    Returns (rel_path, mtime, lines, size, sha256, symbol_rows, import_rows,
+    ref_rows), or None if the file can't be read or parsed. Top-level and
+    built only from picklable values so it can run in a worker process.
+    """
+    path = Path(path_str)
+    rel_path = path.relative_to(git_root_str)
+    try:
+        # ast.parse decodes bytes itself, honouring any coding cookie or BOM
+        data = path.read_bytes()
+        tree = ast.parse(data, filename=path_str)
+        mtime = path.stat().st_mtime
+    except Exception:
+        return None
+    
+    extractor = PythonSymbolExtractor(_module_name(rel_path), collect_refs)
+    extractor.walk(tree)
+    
+    return (
+        str(rel_path),
+        mtime,
+        data.count(b'\n') + 1,
+        len(data),
+        hashlib.sha256(data).digest(),
+        extractor.symbols,
+        extractor.imports,
+        extractor.references,
+    )
+
+
+def _parse_python_files(paths: List[Path], git_root: Path,
+                        collect_refs: bool = True) -> Iterator[Optional[tuple]]:
+    """Yield _parse_python_file() results for paths, in order.
+    
+    Parsing is CPU-bound and holds the GIL, so larger batches are spread
+    over a process pool. Falls back to parsing in-process if the pool
+    can't be used (e.g. the plugin module isn't importable by workers).
+    """
+    path_strs = [str(p) for p in paths]
+    root_str = str(git_root)
+    workers = min(os.cpu_count() or 1, 8)
+    done = 0
+    
+    if workers > 1 and len(path_strs) >= PARALLEL_PARSE_MIN_FILES:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for parsed in executor.map(_parse_python_file, path_strs, repeat(root_str),
+                                           repeat(collect_refs), chunksize=32):
+                    yield parsed
+                    done += 1
+            return
+        except (BrokenProcessPool, pickle.PicklingError, ImportError, AttributeError, OSError):
+            pass
+    
+    for path_str in path_strs[done:]:
+        yield _parse_python_file(path_str, root_str, collect_refs)
+
+
 def register_tools(registry, git_root):
     """Register codebase indexing tools with llode."""
     
     indexer = CodeIndexer(git_root)
+    atexit.register(indexer.close)
+    
+    def locked(func):
+        """Serialize a tool's use of the indexer's shared connection."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with indexer.lock:
+                return func(*args, **kwargs)
+        return wrapper
     
     @registry.register("index_codebase", """Builds or updates semantic index of the codebase.
 
 Parameters:
 - force_rebuild: rebuild entire index from scratch (default: false)
 - path_pattern: only index files matching pattern (default: *.py)
+- track_references: record symbol references for find_symbol (default: true)
 
 Analyzes Python files to extract functions, classes, imports, and references.
 Stores information in SQLite database for fast semantic search.
 Only re-indexes files that have changed since last indexing.
 
+References are by far the most numerous rows, so track_references=false makes
+indexing much faster at the cost of find_symbol only reporting definitions.
+It applies to the files (re)indexed in this run; combine it with
+force_rebuild=true to apply it to the whole index.
+
 Returns summary of indexing results.""")
-    def index_codebase(force_rebuild: str = "false", path_pattern: str = "*.py"):
+    @locked
+    def index_codebase(force_rebuild: str = "false", path_pattern: str = "*.py", track_references: str = "true"):
         """Build or update the codebase index."""
         from pathlib import Path
         import fnmatch
         
         # Access injected context functions
-        # These are set by PluginManager.set_context() in main
-        import sys
-        current_module = sys.modules[__name__]
-        get_gitignore_spec = getattr(current_module, 'get_gitignore_spec', None)
-        walk_files = getattr(current_module, 'walk_files', None)
+        # These are set on this module by PluginManager.set_context() in main
+        get_gitignore_spec = globals().get('get_gitignore_spec')
+        walk_files = globals().get('walk_files')
         
         if not get_gitignore_spec or not walk_files:
             return "Error: Plugin context not properly initialized. Required functions not available."
         
         force = force_rebuild.lower() == "true"
+        collect_refs = track_references.lower() == "true"
         
         if force:
-            # Remove existing database
-            if indexer.db_path.exists():
-                indexer.db_path.unlink()
+            # Remove existing database, including the WAL sidecar files so
+            # they aren't replayed into the new one
+            indexer.close()
+            for suffix in ("", "-wal", "-shm"):
+                db_file = indexer.db_path.with_name(indexer.db_path.name + suffix)
+                if db_file.exists():
+                    db_file.unlink()
             indexer._ensure_db()
+            
+            # Build the reference indexes once after the bulk load instead
+            # of maintaining them row by row (_ensure_db recreates them)
+            indexer.conn.execute("DROP INDEX IF EXISTS idx_refs_name_file_line")
+            indexer.conn.execute("DROP INDEX IF EXISTS idx_references_file")
         
         # Get all files
         gitignore_spec = get_gitignore_spec()
         all_files = walk_files(gitignore_spec)
         
-        # Filter by pattern
-        matching_files = [f for f in all_files if fnmatch.fnmatch(str(f), path_pattern)]
+        # Filter by pattern, translating it to a regex once
+        pattern_re = re.compile(fnmatch.translate(path_pattern))
+        matching_files = [f for f in all_files if pattern_re.match(str(f))]
         
         indexed = 0
         skipped = 0
         errors = []
         
-        for file_path in matching_files:
-            full_path = git_root / file_path
+        # Load stored file states up front instead of querying once per file
+        db_states = {} if force else indexer.get_file_states()
+        
+        # Write files in one shared transaction, committing in batches to
+        # bound transaction size
+        conn = indexer.conn
+        try:
+            conn.execute("BEGIN")
             
-            try:
-                if force or indexer.needs_indexing(full_path):
-                    indexer.index_file(full_path)
+            # Decide what needs indexing first so parsing can run in parallel
+            to_index = []
+            for file_path in matching_files:
+                full_path = git_root / file_path
+                
+                try:
+                    if force or indexer.needs_indexing(full_path, db_states.get(str(file_path))):
+                        to_index.append(full_path)
+                    else:
+                        skipped += 1
+                except Exception as e:
+                    errors.append(f"{file_path}: {str(e)}")
+            
+            python_files = [p for p in to_index if p.suffix == '.py']
+            other_files = [p for p in to_index if p.suffix != '.py']
+            
+            def record(file_path, write, *args):
+                nonlocal indexed
+                try:
+                    write(*args)
                     indexed += 1
-                else:
-                    skipped += 1
-            except Exception as e:
-                errors.append(f"{file_path}: {str(e)}")
+                    if indexed % INDEX_COMMIT_BATCH == 0:
+                        conn.commit()
+                        conn.execute("BEGIN")
+                except Exception as e:
+                    errors.append(f"{file_path.relative_to(git_root)}: {str(e)}")
+            
+            # Parse in worker processes, write from this one
+            parsed_files = _parse_python_files(python_files, git_root, collect_refs)
+            for full_path, parsed in zip(python_files, parsed_files):
+                record(full_path, indexer.write_parsed_file, parsed, conn)
+            
+            for full_path in other_files:
+                record(full_path, indexer.index_file, full_path, conn, collect_refs)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            if force:
+                indexer._ensure_db()
+        
+        # Refresh query planner statistics after bulk changes, sampling
+        # rows so this stays cheap on large indexes
+        if indexed:
+            conn.execute("PRAGMA analysis_limit = 1000")
+            conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        
+        # Compact the file after a full rebuild
+        if force:
+            conn.execute("VACUUM")
         
         # Get statistics
         stats = indexer.get_stats()
@@ -416,14 +761,14 @@ Searches the indexed codebase for symbol definitions and/or usage.
 Much faster and more accurate than text search.
 
 Returns locations with file paths, line numbers, and context.""")
+    @locked
     def find_symbol(symbol_name: str, search_type: str = "all", limit: str = "50"):
         """Find symbol definitions and/or references."""
         if not indexer.db_path.exists():
             return "❌ Index not found. Run index_codebase() first."
         
         max_results = int(limit)
-        conn = sqlite3.connect(indexer.db_path)
-        cursor = conn.cursor()
+        cursor = indexer.conn.cursor()
         
         results = []
         
@@ -455,50 +800,35 @@ Returns locations with file paths, line numbers, and context.""")
         
         # Find references
         if search_type in ("references", "all"):
+            # Coalesce consecutive lines into ranges in SQL ("gaps and
+            # islands"): line_number - ROW_NUMBER() is constant within a run
             cursor.execute("""
-                SELECT f.path, r.line_number
-                FROM "references" r
-                JOIN files f ON r.file_id = f.id
-                WHERE r.symbol_name = ?
-                ORDER BY f.path, r.line_number
+                SELECT path, MIN(line_number), MAX(line_number), COUNT(*)
+                FROM (
+                    SELECT f.path, r.line_number,
+                           r.line_number - ROW_NUMBER() OVER (
+                               PARTITION BY f.path ORDER BY r.line_number
+                           ) AS grp
+                    FROM "references" r
+                    JOIN files f ON r.file_id = f.id
+                    WHERE r.symbol_name = ?
+                )
+                GROUP BY path, grp
+                ORDER BY path, MIN(line_number)
                 LIMIT ?
             """, (symbol_name, max_results))
             
-            references = cursor.fetchall()
+            ranges = cursor.fetchall()
             
-            if references:
-                # Group by file
-                by_file = {}
-                for path, line in references:
-                    if path not in by_file:
-                        by_file[path] = []
-                    by_file[path].append(line)
+            if ranges:
+                results.append(f"\n🔗 References ({sum(row[3] for row in ranges)}):")
                 
-                results.append(f"\n🔗 References ({len(references)}):")
-                for path, lines in sorted(by_file.items()):
-                    line_ranges = []
-                    start = lines[0]
-                    end = lines[0]
-                    
-                    for line in lines[1:]:
-                        if line == end + 1:
-                            end = line
-                        else:
-                            if start == end:
-                                line_ranges.append(str(start))
-                            else:
-                                line_ranges.append(f"{start}-{end}")
-                            start = end = line
-                    
-                    if start == end:
-                        line_ranges.append(str(start))
-                    else:
-                        line_ranges.append(f"{start}-{end}")
-                    
+                # Rows are already ordered by path, so group them as they come
+                for path, group in groupby(ranges, key=itemgetter(0)):
+                    line_ranges = [str(start) if start == end else f"{start}-{end}"
+                                   for _, start, end, _ in group]
                     results.append(f"  {path}: lines {', '.join(line_ranges)}")
         
-        conn.close()
-        
         if not results:
             return f"❌ No results found for symbol: {symbol_name}"
         
@@ -513,6 +843,7 @@ Parameters:
 Shows what modules/symbols a file imports, and optionally what files import from it.
 
 Returns dependency information.""")
+    @locked
     def analyze_dependencies(path: str, direction: str = "both"):
         """Analyze file dependencies."""
         if not indexer.db_path.exists():
@@ -520,10 +851,7 @@ Returns dependency information.""")
         
         # Normalize path
         try:
-            from pathlib import Path
-            import sys
-            current_module = sys.modules[__name__]
-            validate_path = getattr(current_module, 'validate_path', None)
+            validate_path = globals().get('validate_path')
             
             if not validate_path:
                 return "Error: Plugin context not properly initialized. validate_path not available."
@@ -533,8 +861,7 @@ Returns dependency information.""")
         except Exception as e:
             return f"❌ Invalid path: {e}"
         
-        conn = sqlite3.connect(indexer.db_path)
-        cursor = conn.cursor()
+        cursor = indexer.conn.cursor()
         
         results = []
         
@@ -543,7 +870,6 @@ Returns dependency information.""")
         file_record = cursor.fetchone()
         
         if not file_record:
-            conn.close()
             return f"❌ File not in index: {path}"
         
         file_id = file_record[0]
@@ -574,17 +900,29 @@ Returns dependency information.""")
         
         # Show what imports this file
         if direction in ("imported_by", "both"):
-            # This is trickier - need to find files that import from this module
-            # Extract module name from path
-            module_name = rel_path.replace('.py', '').replace('/', '.')
+            # The package root isn't known (src/ layouts, nested packages), so
+            # match every dotted suffix of the path's module name. Each one
+            # matches the module itself, anything beneath it (a range rather
+            # than LIKE so it can use idx_imports_module; '/' sorts directly
+            # after '.') or `from parent import name`
+            parts = _module_name(Path(rel_path)).split('.')
+            conditions = []
+            params = []
+            for i in range(len(parts)):
+                suffix = '.'.join(parts[i:])
+                conditions.append("i.module = ? OR (i.module >= ? AND i.module < ?)")
+                params += [suffix, f"{suffix}.", f"{suffix}/"]
+                if i < len(parts) - 1:
+                    conditions.append("(i.module = ? AND i.imported_symbol = ?)")
+                    params += ['.'.join(parts[i:-1]), parts[-1]]
             
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT DISTINCT f.path, i.line_number
                 FROM imports i
                 JOIN files f ON i.file_id = f.id
-                WHERE i.imported_path LIKE ? OR i.imported_path LIKE ?
+                WHERE {" OR ".join(conditions)}
                 ORDER BY f.path
-            """, (f"%{module_name}%", f"%.{path.split('/')[-1].replace('.py', '')}"))
+            """, params)
             
             imported_by = cursor.fetchall()
             
@@ -593,8 +931,6 @@ Returns dependency information.""")
                 for imp_path, line in imported_by:
                     results.append(f"  {imp_path}:{line}")
         
-        conn.close()
-        
         if not results:
             return f"No dependency information found for: {path}"
         
@@ -606,19 +942,20 @@ Parameters:
 - path: file path to list symbols from (optional)
 - symbol_pattern: pattern to match symbol names (optional, supports * wildcard)
 - symbol_type: filter by type: function|class|method|all (default: all)
+- search: full-text query over names, signatures, docstrings and paths (optional, FTS5 syntax, terms of 3+ characters)
 - limit: maximum results (default: 100)
 
 Lists functions, classes, and methods with their signatures.
 
 Returns symbol listing with locations.""")
-    def list_symbols(path: str = "", symbol_pattern: str = "*", symbol_type: str = "all", limit: str = "100"):
+    @locked
+    def list_symbols(path: str = "", symbol_pattern: str = "*", symbol_type: str = "all", search: str = "", limit: str = "100"):
         """List symbols from index."""
         if not indexer.db_path.exists():
             return "❌ Index not found. Run index_codebase() first."
         
         max_results = int(limit)
-        conn = sqlite3.connect(indexer.db_path)
-        cursor = conn.cursor()
+        cursor = indexer.conn.cursor()
         
         query_parts = ["""
             SELECT f.path, s.name, s.type, s.line_start, s.signature, s.parent_symbol
@@ -631,10 +968,7 @@ Returns symbol listing with locations.""")
         # Filter by file path
         if path:
             try:
-                from pathlib import Path
-                import sys
-                current_module = sys.modules[__name__]
-                validate_path = getattr(current_module, 'validate_path', None)
+                validate_path = globals().get('validate_path')
                 
                 if validate_path:
                     full_path = validate_path(path)
@@ -644,12 +978,22 @@ Returns symbol listing with locations.""")
             except:
                 pass
         
-        # Filter by symbol name pattern
+        # Filter by symbol name pattern, through the trigram index if there is one
         if symbol_pattern != "*":
             sql_pattern = symbol_pattern.replace('*', '%')
-            query_parts.append("AND s.name LIKE ?")
+            if indexer.fts_available:
+                query_parts.append("AND s.id IN (SELECT rowid FROM symbols_fts WHERE name LIKE ?)")
+            else:
+                query_parts.append("AND s.name LIKE ?")
             params.append(sql_pattern)
         
+        # Full-text search
+        if search:
+            if not indexer.fts_available:
+                return "❌ Full-text search needs SQLite 3.34+ with FTS5; use symbol_pattern instead"
+            query_parts.append("AND s.id IN (SELECT rowid FROM symbols_fts WHERE symbols_fts MATCH ?)")
+            params.append(search)
+        
         # Filter by symbol type
         if symbol_type != "all":
             query_parts.append("AND s.type = ?")
@@ -658,9 +1002,11 @@ Returns symbol listing with locations.""")
         query_parts.append("ORDER BY f.path, s.line_start LIMIT ?")
         params.append(max_results)
         
-        cursor.execute(' '.join(query_parts), params)
+        try:
+            cursor.execute(' '.join(query_parts), params)
+        except sqlite3.OperationalError as e:
+            return f"❌ Invalid search query: {e}"
         symbols = cursor.fetchall()
-        conn.close()
         
         if not symbols:
             return "No symbols found matching criteria"
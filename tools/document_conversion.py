@@ -12,14 +12,88 @@ Converts documents to/from markdown format for easy editing.
 Supports PDF, DOCX, ODT, RTF, HTML, EPUB, and more.
 """
 
+import functools
+import os
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from ._conv_cache import ConversionCache
+from ._pandoc_server import PANDOC_FORMATS, convert_with_server
+
+
+PANDOC_INSTALL_HELP = (
+    "❌ Error: pandoc is not installed.\n\n"
+    "To install pandoc:\n"
+    "  - macOS: brew install pandoc\n"
+    "  - Ubuntu/Debian: sudo apt-get install pandoc\n"
+    "  - Windows: Download from https://pandoc.org/installing.html\n"
+    "  - Other: See https://pandoc.org/installing.html"
+)
+
+PDFTOTEXT_INSTALL_HELP = (
+    "❌ Error: pdftotext is not installed.\n\n"
+    "To install pdftotext:\n"
+    "  - macOS: brew install poppler\n"
+    "  - Ubuntu/Debian: sudo apt-get install poppler-utils\n"
+    "  - Windows: Download poppler from https://blog.alivate.com.au/poppler-windows/\n"
+    "  - Other: See https://poppler.freedesktop.org/"
+)
+
+
+class Converter(NamedTuple):
+    """How convert_to_markdown handles one kind of input."""
+    tool: str
+    label: str  # Tool name as shown in messages
+    flags: Tuple[str, ...]  # Also part of the cache key
+    argv: Callable[[Tuple[str, ...], Path, Path], List[str]]  # (flags, src, out)
+    install_help: str
+    description: str  # What the success message says was converted
+    error_context: str
+    use_server: bool
+
+
+# pdftotext converts to plain text, saved with .md extension
+# Using -layout option to preserve text layout better
+PDFTOTEXT = Converter(
+    tool="pdftotext",
+    label="pdftotext",
+    flags=("-layout",),
+    argv=lambda flags, src, out: ["pdftotext", *flags, str(src), str(out)],
+    install_help=PDFTOTEXT_INSTALL_HELP,
+    description="PDF to markdown",
+    error_context="PDF conversion",
+    use_server=False,
+)
+
+PANDOC = Converter(
+    tool="pandoc",
+    label="Pandoc",
+    flags=(),
+    argv=lambda flags, src, out: ["pandoc", *flags, str(src), "-o", str(out)],
+    install_help=PANDOC_INSTALL_HELP,
+    description="to markdown",
+    error_context="conversion",
+    use_server=True,
+)
+
+# Converter by input extension; anything else goes to pandoc
+CONVERTERS = {
+    '.pdf': PDFTOTEXT,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def which(tool: str) -> Optional[str]:
+    """shutil.which, looked up once per tool."""
+    return shutil.which(tool)
 
 
 def check_pandoc_installed():
     """Check if pandoc is installed."""
-    return shutil.which("pandoc") is not None
+    return which("pandoc") is not None
 
 
 def register_tools(registry, git_root):
@@ -30,6 +104,9 @@ def register_tools(registry, git_root):
     parent_module = sys.modules['__main__']
     validate_path = parent_module.validate_path
     
+    # Converted output of previously seen inputs
+    conversion_cache = ConversionCache(git_root / ".llode" / "cache" / "conversions")
+    
     @registry.register("convert_to_markdown", """Converts a document to markdown format using pandoc or pdftotext.
 
 Parameters:
@@ -53,7 +130,9 @@ The system will automatically suggest conversion when you try to read binary fil
     def convert_to_markdown(path: str) -> str:
         """Convert a document to markdown using pandoc or pdftotext."""
         file_path = validate_path(path)
-        if not file_path.exists():
+        try:
+            st_in = file_path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(f"File not found: {path}")
         
         # Generate output path (keep the same naming convention: file.pdf -> file.pdf.md)
@@ -66,92 +145,80 @@ The system will automatically suggest conversion when you try to read binary fil
                 f"Use file_read to view it, or delete it first if you want to reconvert."
             )
         
-        # Check if this is a PDF file
-        if file_path.suffix.lower() == '.pdf':
-            # Use pdftotext for PDF files
-            if not shutil.which("pdftotext"):
-                return (
-                    "❌ Error: pdftotext is not installed.\n\n"
-                    "To install pdftotext:\n"
-                    "  - macOS: brew install poppler\n"
-                    "  - Ubuntu/Debian: sudo apt-get install poppler-utils\n"
-                    "  - Windows: Download poppler from https://blog.alivate.com.au/poppler-windows/\n"
-                    "  - Other: See https://poppler.freedesktop.org/"
+        suffix = file_path.suffix.lower()
+        converter = CONVERTERS.get(suffix, PANDOC)
+        if not which(converter.tool):
+            return converter.install_help
+        
+        def run_converter():
+            # Prefer the long-running pandoc server over a new process
+            if converter.use_server:
+                output = convert_with_server(
+                    PANDOC_FORMATS.get(suffix), "markdown", file_path.read_bytes()
                 )
+                if output is not None:
+                    output_path.write_bytes(output)
+                    return None
             
-            try:
-                # pdftotext converts to plain text, saved with .md extension
-                # Using -layout option to preserve text layout better
-                result = subprocess.run(
-                    ["pdftotext", "-layout", str(file_path), str(output_path)],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode != 0:
-                    error_msg = result.stderr or "Unknown error"
-                    return f"❌ pdftotext conversion failed:\n{error_msg}"
-                
-                # Get size info
-                original_size = file_path.stat().st_size
-                markdown_size = output_path.stat().st_size
-                
-                rel_output = output_path.relative_to(git_root)
-                return (
-                    f"✓ Successfully converted PDF to markdown:\n"
-                    f"  Input:  {path} ({original_size:,} bytes)\n"
-                    f"  Output: {rel_output} ({markdown_size:,} bytes)\n\n"
-                    f"You can now use file_read or file_edit on: {rel_output}"
-                )
-                
-            except subprocess.TimeoutExpired:
-                return "❌ Error: pdftotext conversion timed out after 30 seconds"
-            except Exception as e:
-                return f"❌ Error during PDF conversion: {str(e)}"
+            result = subprocess.run(
+                converter.argv(converter.flags, file_path, output_path),
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            
+            if result.returncode != 0:
+                error_msg = result.stderr or "Unknown error"
+                return f"❌ {converter.label} conversion failed:\n{error_msg}"
         
-        else:
-            # Use pandoc for other document formats
-            if not check_pandoc_installed():
-                return (
-                    "❌ Error: pandoc is not installed.\n\n"
-                    "To install pandoc:\n"
-                    "  - macOS: brew install pandoc\n"
-                    "  - Ubuntu/Debian: sudo apt-get install pandoc\n"
-                    "  - Windows: Download from https://pandoc.org/installing.html\n"
-                    "  - Other: See https://pandoc.org/installing.html"
-                )
+        try:
+            # Keyed on the input format too, as pandoc infers it from the extension
+            cache_key = conversion_cache.key_for(converter.tool, [*converter.flags, suffix], file_path)
+            error = conversion_cache.get_or_run(cache_key, output_path, run_converter)
+            if error:
+                return error
+            
+            # Get size info
+            original_size = st_in.st_size
+            markdown_size = os.stat(output_path).st_size
+            
+            rel_output = output_path.relative_to(git_root)
+            return (
+                f"✓ Successfully converted {converter.description}:\n"
+                f"  Input:  {path} ({original_size:,} bytes)\n"
+                f"  Output: {rel_output} ({markdown_size:,} bytes)\n\n"
+                f"You can now use file_read or file_edit on: {rel_output}"
+            )
             
+        except subprocess.TimeoutExpired:
+            return f"❌ Error: {converter.label} conversion timed out after 30 seconds"
+        except Exception as e:
+            return f"❌ Error during {converter.error_context}: {str(e)}"
+    
+    @registry.register("convert_to_markdown_batch", """Converts several documents to markdown concurrently.
+
+Parameters:
+- paths: comma-separated relative paths to the document files
+
+Runs convert_to_markdown for each file in parallel (sharing the pandoc server
+and conversion cache) and returns each file's result in the given order.""")
+    def convert_to_markdown_batch(paths: str) -> str:
+        """Convert several documents to markdown in parallel."""
+        path_list = [p.strip() for p in paths.split(',') if p.strip()]
+        if not path_list:
+            return "❌ No paths given"
+        
+        def convert_one(path):
             try:
-                # Run pandoc conversion
-                result = subprocess.run(
-                    ["pandoc", str(file_path), "-o", str(output_path)],
-                    capture_output=True,
-                    text=True,
-                    timeout=30
-                )
-                
-                if result.returncode != 0:
-                    error_msg = result.stderr or "Unknown error"
-                    return f"❌ Pandoc conversion failed:\n{error_msg}"
-                
-                # Get size info
-                original_size = file_path.stat().st_size
-                markdown_size = output_path.stat().st_size
-                
-                rel_output = output_path.relative_to(git_root)
-                return (
-                    f"✓ Successfully converted to markdown:\n"
-                    f"  Input:  {path} ({original_size:,} bytes)\n"
-                    f"  Output: {rel_output} ({markdown_size:,} bytes)\n\n"
-                    f"You can now use file_read or file_edit on: {rel_output}"
-                )
-                
-            except subprocess.TimeoutExpired:
-                return "❌ Error: Pandoc conversion timed out after 30 seconds"
+                return convert_to_markdown(path)
             except Exception as e:
-                return f"❌ Error during conversion: {str(e)}"
-
+                return f"❌ {path}: {str(e)}"
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+            results = list(executor.map(convert_one, path_list))
+        
+        return "\n\n".join(results)
+    
     @registry.register("convert_from_markdown", """Converts a markdown file back to another format using pandoc.
 
 Parameters:
@@ -166,17 +233,12 @@ Requires pandoc to be installed.""")
     def convert_from_markdown(path: str, output_format: str) -> str:
         """Convert a markdown file to another format using pandoc."""
         if not check_pandoc_installed():
-            return (
-                "❌ Error: pandoc is not installed.\n\n"
-                "To install pandoc:\n"
-                "  - macOS: brew install pandoc\n"
-                "  - Ubuntu/Debian: sudo apt-get install pandoc\n"
-                "  - Windows: Download from https://pandoc.org/installing.html\n"
-                "  - Other: See https://pandoc.org/installing.html"
-            )
+            return PANDOC_INSTALL_HELP
         
         file_path = validate_path(path)
-        if not file_path.exists():
+        try:
+            st_in = file_path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(f"File not found: {path}")
         
         # Validate format
@@ -200,21 +262,28 @@ Requires pandoc to be installed.""")
             return f"❌ Input file must be a markdown file (.md): {path}"
         
         try:
-            # Run pandoc conversion
-            result = subprocess.run(
-                ["pandoc", str(file_path), "-o", str(output_path)],
-                capture_output=True,
-                text=True,
-                timeout=30
+            # Prefer the long-running pandoc server, falling back to running
+            # pandoc (always for PDF, which needs an external LaTeX engine)
+            output = convert_with_server(
+                "markdown", PANDOC_FORMATS.get(output_path.suffix.lower()), file_path.read_bytes()
             )
-            
-            if result.returncode != 0:
-                error_msg = result.stderr or "Unknown error"
-                return f"❌ Pandoc conversion failed:\n{error_msg}"
+            if output is not None:
+                output_path.write_bytes(output)
+            else:
+                result = subprocess.run(
+                    ["pandoc", str(file_path), "-o", str(output_path)],
+                    capture_output=True,
+                    text=True,
+                    timeout=30
+                )
+                
+                if result.returncode != 0:
+                    error_msg = result.stderr or "Unknown error"
+                    return f"❌ Pandoc conversion failed:\n{error_msg}"
             
             # Get size info
-            markdown_size = file_path.stat().st_size
-            output_size = output_path.stat().st_size
+            markdown_size = st_in.st_size
+            output_size = os.stat(output_path).st_size
             
             rel_output = output_path.relative_to(git_root)
             return (
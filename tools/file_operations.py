@@ -3,17 +3,117 @@ File operations tool module.
 
 Dependencies:
 - None (uses Python standard library)
+- pyahocorasick (optional, speeds up search_replace_many with many pairs)
 
 Description:
 Provides comprehensive file manipulation tools including listing, reading,
 editing, searching, moving, deleting, and multi-file search and replace.
 """
 
+import errno
+import io
+import json
+import mmap
+import os
 import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from fnmatch import fnmatch
-from typing import List
+from functools import lru_cache
+from itertools import islice
+from typing import List, Optional, Tuple
 from difflib import unified_diff
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+# Searching files is I/O-bound, so use more threads than cores
+SEARCH_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+# file_read streams line ranges from files larger than this instead of
+# loading them whole (the header then omits the total line count)
+FILE_READ_STREAM_THRESHOLD = 1024 * 1024
+
+# file_edit stops rendering its diff after this many characters
+FILE_EDIT_MAX_DIFF_CHARS = 64 * 1024
+
+# Files larger than this are pre-checked through mmap instead of being read
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def _read_if_contains(path, needle: bytes) -> Optional[bytes]:
+    """Return a file's bytes if they contain needle, otherwise None.
+    
+    Large files are searched through mmap first so non-matching ones are
+    never copied into memory.
+    """
+    size = os.stat(path).st_size
+    if size < len(needle):
+        return None
+    
+    if size > MMAP_THRESHOLD:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(needle) < 0:
+                    return None
+        finally:
+            os.close(fd)
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return raw if raw.find(needle) >= 0 else None
+
+
+def _build_multi_replacer(pairs: List[Tuple[str, str]]):
+    """Build a function that applies all replacements in a single pass.
+    
+    At each position the longest matching search term wins, and matches
+    never overlap. The returned function maps content to (new_content,
+    replacements). Uses an Aho-Corasick automaton when pyahocorasick is
+    available, otherwise one regex alternation (longest terms first).
+    """
+    replacements = dict(pairs)
+    
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for search, _ in pairs:
+            automaton.add_word(search, search)
+        automaton.make_automaton()
+        
+        def replace_all(content: str) -> Tuple[str, int]:
+            # Leftmost match first, longest first among equal starts
+            matches = sorted((end - len(search) + 1, -len(search), search)
+                             for end, search in automaton.iter(content))
+            parts = []
+            pos = 0
+            count = 0
+            for start, _, search in matches:
+                if start < pos:
+                    continue
+                parts.append(content[pos:start])
+                parts.append(replacements[search])
+                pos = start + len(search)
+                count += 1
+            parts.append(content[pos:])
+            return ''.join(parts), count
+        
+        return replace_all
+    
+    pattern = re.compile('|'.join(re.escape(search) for search in
+                                  sorted(replacements, key=len, reverse=True)))
+    
+    def replace_all(content: str) -> Tuple[str, int]:
+        return pattern.subn(lambda m: replacements[m.group()], content)
+    
+    return replace_all
+
 
 def register_tools(registry, git_root):
     """Register file operation tools."""
@@ -22,16 +122,30 @@ def register_tools(registry, git_root):
     import sys
     parent_module = sys.modules['__main__']
     validate_path = parent_module.validate_path
-    get_gitignore_spec = parent_module.get_gitignore_spec
+    load_gitignore_spec = parent_module.get_gitignore_spec
     walk_files = parent_module.walk_files
     
+    @lru_cache(maxsize=4)
+    def cached_gitignore_spec(mtime_ns, size):
+        return load_gitignore_spec()
+    
+    def get_gitignore_spec():
+        """Load the .gitignore spec, reusing it while .gitignore is unchanged."""
+        try:
+            st = (git_root / ".gitignore").stat()
+        except FileNotFoundError:
+            return cached_gitignore_spec(None, None)
+        except OSError:
+            return load_gitignore_spec()
+        return cached_gitignore_spec(st.st_mtime_ns, st.st_size)
+    
     @registry.register("file_list", """Lists all files in the project directory recursively.
 
 Returns a list of all files, excluding those in .gitignore and dotfiles.""")
     def file_list() -> str:
         """List all files in the git root directory, respecting .gitignore."""
         files = walk_files(get_gitignore_spec())
-        return "\n".join(str(f) for f in files) if files else "(no files found)"
+        return "\n".join(map(os.fspath, files)) if files else "(no files found)"
     
     @registry.register("file_read", """Reads the contents of a file.
 
@@ -64,11 +178,30 @@ EXAMPLES:
             )
         
         try:
-            content = file_path.read_text()
-            
             # If no line range specified, return full content
             if start_line is None and end_line is None:
-                return content
+                return file_path.read_text()
+            
+            # Read only up to the requested range from large files
+            if file_path.stat().st_size > FILE_READ_STREAM_THRESHOLD:
+                start = int(start_line) if start_line is not None else 1
+                end = int(end_line) if end_line is not None else None
+                
+                if start < 1:
+                    raise ValueError(f"start_line must be >= 1, got {start}")
+                if end is not None and end < start:
+                    raise ValueError(f"end_line ({end}) must be >= start_line ({start})")
+                
+                with open(file_path, 'r') as f:
+                    selected_lines = list(islice(f, start - 1, end))
+                
+                if not selected_lines:
+                    raise ValueError(f"start_line ({start}) exceeds file length")
+                
+                end = start + len(selected_lines) - 1
+                return f"Lines {start}-{end}:\n" + ''.join(selected_lines)
+            
+            content = file_path.read_text()
             
             # Parse line numbers
             lines = content.splitlines(keepends=True)
@@ -151,16 +284,43 @@ EXAMPLES:
             )
         
         new_content = content.replace(old_str, new_str, 1)
-        file_path.write_text(new_content)
+        old_lines = content.splitlines(keepends=True)
+        new_lines = new_content.splitlines(keepends=True)
+        
+        # Write to a temporary file and swap it in, so the file is never
+        # left half-written. The name is unique, so it can't clobber a real
+        # file or collide with a concurrent edit of the same file
+        fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(new_content)
+            shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
         
         diff = unified_diff(
-            content.splitlines(keepends=True),
-            new_content.splitlines(keepends=True),
+            old_lines,
+            new_lines,
             fromfile=f"{path} (old)",
             tofile=f"{path} (new)",
             lineterm=''
         )
-        return "".join(diff) or "File updated (no diff to display)"
+        
+        # Stream the diff out, stopping once it gets too large to be useful
+        output = io.StringIO()
+        written = 0
+        for line in diff:
+            if written + len(line) > FILE_EDIT_MAX_DIFF_CHARS:
+                output.write("\n... diff truncated ...\n")
+                break
+            output.write(line)
+            written += len(line)
+        return output.getvalue() or "File updated (no diff to display)"
     
     @registry.register("search_codebase", """Searches for a string in the codebase.
 
@@ -175,21 +335,45 @@ Returns matching lines with file paths and line numbers.""")
         gitignore_spec = get_gitignore_spec()
         files = walk_files(gitignore_spec)
         
-        results = []
-        search_pattern = search_term if case_sensitive_bool else search_term.lower()
+        pattern = re.compile(re.escape(search_term), 0 if case_sensitive_bool else re.IGNORECASE)
+        if case_sensitive_bool:
+            search_bytes = search_term.encode('utf-8')
+        else:
+            search_bytes = search_term.lower().encode('ascii') if search_term.isascii() else None
         
-        for file_path in files:
+        def scan(file_path) -> List[str]:
+            """Return the matching lines of one file."""
             try:
                 full_path = git_root / file_path
-                content = full_path.read_text()
+                
+                # Skip files without a match before decoding them. Lowering
+                # bytes only folds ASCII, so the case-insensitive check is
+                # limited to ASCII files
+                if case_sensitive_bool:
+                    raw = _read_if_contains(full_path, search_bytes)
+                    if raw is None:
+                        return []
+                else:
+                    raw = full_path.read_bytes()
+                    if search_bytes is not None and raw.isascii() and raw.lower().find(search_bytes) < 0:
+                        return []
+                
+                content = raw.decode('utf-8')
                 lines = content.splitlines()
                 
+                matches = []
                 for line_num, line in enumerate(lines, 1):
-                    compare_line = line if case_sensitive_bool else line.lower()
-                    if search_pattern in compare_line:
-                        results.append(f"{file_path}:{line_num}: {line.strip()}")
+                    if pattern.search(line):
+                        matches.append(f"{file_path}:{line_num}: {line.strip()}")
+                return matches
             except (UnicodeDecodeError, PermissionError):
-                continue
+                return []
+        
+        # Scan files in parallel; map() keeps results in file order
+        results = []
+        with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+            for matches in executor.map(scan, files):
+                results.extend(matches)
         
         return "\n".join(results) if results else f"No matches found for: {search_term}"
     
@@ -236,8 +420,14 @@ new_location/file.py
             # Create parent directory if needed
             dest_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Move the file
-            source_path.rename(dest_path)
+            # Move the file. rename() can't cross filesystems; shutil.move
+            # then copies (via sendfile on Linux) with metadata and unlinks
+            try:
+                source_path.rename(dest_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(str(source_path), str(dest_path))
             
             return f"✓ Moved: {source} → {destination}"
             
@@ -269,6 +459,43 @@ Deletes the specified file. Use with caution!""")
         except Exception as e:
             return f"❌ Error deleting file: {str(e)}"
     
+    def run_replacements(process_one, files) -> Tuple[List[Tuple[str, int]], List[str]]:
+        """Run process_one over files in the thread pool.
+        
+        Returns (modified, failures): (path, replacements) for each changed
+        file and an error message for each file that failed. One failure
+        doesn't stop the rest, so both are reported. Results keep file
+        order, so the summary stays deterministic.
+        """
+        modified = []
+        failures = []
+        with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+            futures = [executor.submit(process_one, file_path) for file_path in files]
+            for future in futures:
+                try:
+                    result = future.result()
+                except RuntimeError as e:
+                    failures.append(str(e))
+                    continue
+                if result:
+                    modified.append(result)
+        return modified, failures
+    
+    def replacement_summary(action: str, modified_files: List[Tuple[str, int]], failures: List[str]) -> str:
+        """Summarize a replacement run, listing changed and failed files."""
+        if modified_files:
+            summary = [f"{'⚠️ ' if failures else '✓'} {action} across {len(modified_files)} file(s):"]
+        else:
+            summary = ["❌ No files were modified."]
+        for file_path, count in modified_files:
+            summary.append(f"  {file_path}: {count} replacement(s)")
+        if modified_files:
+            summary.append(f"\nTotal replacements: {sum(count for _, count in modified_files)}")
+        if failures:
+            summary.append(f"\n❌ Failed to process {len(failures)} file(s):")
+            summary.extend(f"  {failure}" for failure in failures)
+        return "\n".join(summary)
+    
     @registry.register("search_replace", """Search and replace text across multiple files.
 
 Parameters:
@@ -321,42 +548,131 @@ Content-Disposition: param; name="file_pattern"
         if not matching_files:
             return f"❌ No files match pattern: {file_pattern}"
         
-        # Perform search and replace
-        modified_files = []
-        total_replacements = 0
+        # Compile the case-insensitive pattern once for all files
+        if not case_sensitive_bool:
+            pattern = re.compile(re.escape(search_term), re.IGNORECASE)
+            search_lower = search_term.lower() if search_term.isascii() else None
+        search_bytes = search_term.encode('utf-8')
         
-        for file_path in matching_files:
+        def process_one(file_path) -> Optional[Tuple[str, int]]:
+            """Replace in one file; returns (path, replacements) if it changed."""
             try:
                 full_path = git_root / file_path
-                content = full_path.read_text()
+                
+                # Cheap substring check first; most files won't match, and
+                # case-sensitive misses are found on the raw bytes without
+                # decoding. For case-insensitive search, lower() only agrees
+                # exactly with re.IGNORECASE when both sides are ASCII
+                if case_sensitive_bool:
+                    raw = _read_if_contains(full_path, search_bytes)
+                    if raw is None:
+                        return None
+                else:
+                    raw = full_path.read_bytes()
+                
+                content = raw.decode('utf-8')
+                
+                if not case_sensitive_bool and search_lower is not None and content.isascii():
+                    if search_lower not in content.lower():
+                        return None
                 
                 # Perform replacement
                 if case_sensitive_bool:
+                    replacements = content.count(search_term)
                     new_content = content.replace(search_term, replace_term)
                 else:
-                    # Case-insensitive replacement
-                    pattern = re.compile(re.escape(search_term), re.IGNORECASE)
-                    new_content = pattern.sub(replace_term, content)
+                    # Case-insensitive replacement, counting in the same pass
+                    new_content, replacements = pattern.subn(replace_term, content)
                 
                 # Check if content changed
                 if new_content != content:
-                    replacements = content.count(search_term) if case_sensitive_bool else len(re.findall(re.escape(search_term), content, re.IGNORECASE))
-                    full_path.write_text(new_content)
-                    modified_files.append((str(file_path), replacements))
-                    total_replacements += replacements
+                    full_path.write_text(new_content, encoding='utf-8')
+                    return str(file_path), replacements
                     
             except (UnicodeDecodeError, PermissionError):
-                continue
+                pass
             except Exception as e:
-                return f"❌ Error processing {file_path}: {str(e)}"
+                raise RuntimeError(f"{file_path}: {str(e)}") from e
+            return None
+        
+        # Perform search and replace, one file per task
+        modified_files, failures = run_replacements(process_one, matching_files)
         
-        if not modified_files:
+        if not modified_files and not failures:
             return f"❌ No matches found for: {search_term}"
         
-        # Build summary
-        summary = [f"✓ Replaced '{search_term}' with '{replace_term}' across {len(modified_files)} file(s):"]
-        for file_path, count in modified_files:
-            summary.append(f"  {file_path}: {count} replacement(s)")
-        summary.append(f"\nTotal replacements: {total_replacements}")
+        return replacement_summary(
+            f"Replaced '{search_term}' with '{replace_term}'", modified_files, failures
+        )
+    
+    @registry.register("search_replace_many", """Applies several search/replace pairs across files in one pass.
+
+Parameters:
+- pairs: JSON list of [search, replace] pairs (required), e.g. [["old_a", "new_a"], ["old_b", "new_b"]]
+- file_pattern: file pattern to match (optional, e.g., "*.py" or "src/*.js")
+
+Each file is scanned once for all search terms (case-sensitive). Where terms
+overlap, the longest match at a position wins; replaced text is not searched
+again. Much faster than repeated search_replace calls for batch renames.
+Returns summary of changes made.""")
+    def search_replace_many(pairs: str, file_pattern: str = "*") -> str:
+        """Apply several search/replace pairs across files in a single pass."""
+        try:
+            data = json.loads(pairs)
+        except ValueError as e:
+            return f"❌ pairs must be a JSON list of [search, replace] pairs: {str(e)}"
+        
+        # Check the shape strictly: a string or object would otherwise unpack
+        # character by character into pairs nobody asked for
+        if not isinstance(data, list) or not all(
+            isinstance(item, list) and len(item) == 2
+            and all(isinstance(part, str) for part in item)
+            for item in data
+        ):
+            return '❌ pairs must be a JSON list of [search, replace] string pairs, e.g. [["old", "new"]]'
+        pair_list = [(search, replace) for search, replace in data]
+        
+        if not pair_list:
+            return "❌ pairs cannot be empty"
+        if any(not search for search, _ in pair_list):
+            return "❌ search terms cannot be empty"
+        if len({search for search, _ in pair_list}) != len(pair_list):
+            return "❌ search terms must be unique"
+        
+        gitignore_spec = get_gitignore_spec()
+        all_files = walk_files(gitignore_spec)
+        
+        # Filter files by pattern
+        if file_pattern and file_pattern != "*":
+            matching_files = [f for f in all_files if fnmatch(str(f), file_pattern)]
+        else:
+            matching_files = all_files
+        
+        if not matching_files:
+            return f"❌ No files match pattern: {file_pattern}"
+        
+        replace_all = _build_multi_replacer(pair_list)
+        
+        def process_one(file_path) -> Optional[Tuple[str, int]]:
+            """Replace in one file; returns (path, replacements) if it changed."""
+            try:
+                full_path = git_root / file_path
+                content = full_path.read_bytes().decode('utf-8')
+                new_content, replacements = replace_all(content)
+                if new_content != content:
+                    full_path.write_text(new_content, encoding='utf-8')
+                    return str(file_path), replacements
+            except (UnicodeDecodeError, PermissionError):
+                pass
+            except Exception as e:
+                raise RuntimeError(f"{file_path}: {str(e)}") from e
+            return None
+        
+        modified_files, failures = run_replacements(process_one, matching_files)
+        
+        if not modified_files and not failures:
+            return f"❌ No matches found for any of {len(pair_list)} search term(s)"
         
-        return "\n".join(summary)
\ No newline at end of file
+        return replacement_summary(
+            f"Applied {len(pair_list)} replacement pair(s)", modified_files, failures
+        )
\ No newline at end of file
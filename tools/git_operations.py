@@ -5,14 +5,380 @@ Provides git integration tools for staging, committing, and viewing changes.
 
 Dependencies:
 - git command-line tool
+- pygit2 (optional, runs add/commit/diff in-process via libgit2)
 
 Description:
 Adds git workflow commands to LLODE for version control integration.
 All commits are automatically prefixed with [llode] for tracking.
 """
 
+import atexit
+import functools
+import json
+import os
+import re
 import subprocess
+import tempfile
+import threading
 from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+
+# Seconds after the last git_add before the staged index is written to disk
+INDEX_WRITE_DELAY = 0.2
+
+# Above this many paths, git add reads them from stdin instead of argv
+GIT_ADD_PATHSPEC_STDIN_MIN = 50
+
+# Past either limit git_diff returns only the --shortstat summary
+DIFF_MAX_FILES = 50
+DIFF_MAX_CHANGED_LINES = 20000
+DIFF_DEFAULT_MAX_LINES = 2000
+DIFF_MAX_BYTES = 1024 * 1024
+DIFF_TIMEOUT = 30
+
+DIFF_MODES = ("patch", "names", "empty")
+
+DIFF_TRUNCATED_NOTE = "\n… truncated, use git_diff(file_path=...) or a larger max_lines for details"
+DIFF_TRUNCATED_FILE_NOTE = "\n… truncated, use a larger max_lines to see more"
+
+# Environment variables that change the identity or date git commit records
+COMMIT_ENV_OVERRIDES = (
+    "GIT_AUTHOR_NAME", "GIT_AUTHOR_EMAIL", "GIT_AUTHOR_DATE",
+    "GIT_COMMITTER_NAME", "GIT_COMMITTER_EMAIL", "GIT_COMMITTER_DATE",
+)
+
+# libgit2's GIT_REPOSITORY_STATE_NONE (no merge, rebase, cherry-pick, ... underway);
+# pygit2 exposes it as a constant or an enum depending on the version
+REPOSITORY_STATE_NONE = 0
+
+OID_RE = re.compile(r'[0-9a-f]{40}([0-9a-f]{24})?')
+
+SHORTSTAT_RE = re.compile(
+    r'(\d+) files? changed(?:, (\d+) insertions?\(\+\))?(?:, (\d+) deletions?\(-\))?'
+)
+
+
+def open_repository(git_root: Path):
+    """Open the repository with pygit2, or return None to use the git CLI."""
+    if pygit2 is None:
+        return None
+    try:
+        return pygit2.Repository(str(git_root))
+    except (pygit2.GitError, KeyError):
+        return None
+
+
+class DeferredIndex:
+    """The repository index, kept in memory between tool calls.
+    
+    Changes are written to disk once no further change has arrived for
+    INDEX_WRITE_DELAY seconds, or when flush() is called, so a run of
+    git_add calls costs one index write. Hold `lock` while using the index.
+    """
+    
+    def __init__(self, repo, delay: float = INDEX_WRITE_DELAY):
+        self.index = repo.index
+        self.delay = delay
+        self.dirty = False
+        self.timer = None
+        self.lock = threading.RLock()
+        atexit.register(self.flush)
+    
+    def load(self):
+        """Return the index, reloaded if it changed on disk and has no unwritten changes."""
+        if not self.dirty:
+            self.index.read(False)
+        return self.index
+    
+    def changed(self):
+        """Note an in-memory change and (re)start the write timer."""
+        self.dirty = True
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = threading.Timer(self.delay, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+    
+    def flush(self):
+        """Write pending changes now; call before git itself reads the index."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.dirty:
+                self.index.write()
+                self.dirty = False
+
+
+def _pygit2_add(index, git_root: Path, rel_paths: List[str]):
+    """Stage paths like `git add`, including deletions."""
+    # Check up front so a bad path leaves the index untouched
+    for rel_path in rel_paths:
+        if not (git_root / rel_path).exists() and rel_path not in index:
+            raise pygit2.GitError(f"pathspec '{rel_path}' did not match any files")
+    
+    for rel_path in rel_paths:
+        # Staging a removed file stages its deletion
+        if (git_root / rel_path).exists():
+            index.add(rel_path)
+        else:
+            index.remove(rel_path)
+
+
+def _pygit2_commit(repo, index, message: str) -> Optional[str]:
+    """Commit the index; returns the new commit id, or None if nothing is staged."""
+    tree = index.write_tree()
+    
+    if repo.head_is_unborn:
+        parents = []
+        if not len(index):
+            return None
+    else:
+        head = repo.head.peel(pygit2.Commit)
+        if head.tree_id == tree:
+            return None
+        parents = [head.id]
+    
+    signature = repo.default_signature
+    oid = repo.create_commit('HEAD', signature, signature, message, tree, parents)
+    return str(oid)
+
+
+def _git_dir(git_root: Path) -> Path:
+    """Locate the git directory, following a worktree's `.git` file."""
+    dot_git = git_root / ".git"
+    if dot_git.is_file():
+        gitdir = dot_git.read_text().strip()
+        if gitdir.startswith("gitdir: "):
+            return (git_root / gitdir[8:]).resolve()
+    return dot_git
+
+
+def _lookup_packed_refs(git_dir: Path, ref: str) -> Optional[str]:
+    """Find a ref in packed-refs."""
+    try:
+        with open(git_dir / "packed-refs", 'r', encoding='utf-8') as f:
+            for line in f:
+                oid, _, name = line.rstrip('\n').partition(' ')
+                if name == ref:
+                    return oid
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _common_dir(git_dir: Path) -> Path:
+    """The directory shared by all worktrees (refs, hooks, config)."""
+    commondir_file = git_dir / "commondir"
+    if commondir_file.exists():
+        return (git_dir / commondir_file.read_text().strip()).resolve()
+    return git_dir
+
+
+def _read_head_oid(git_root: Path) -> Optional[str]:
+    """Read the commit HEAD points to from the git directory, without running git.
+    
+    Returns None when it can't be determined this way (e.g. a reftable
+    repository), so callers can fall back to `git rev-parse`.
+    """
+    try:
+        git_dir = _git_dir(git_root)
+        head = (git_dir / "HEAD").read_text().strip()
+        if head.startswith("ref: "):
+            ref = head[5:]
+            # Linked worktrees keep branch refs in the main git directory
+            common_dir = _common_dir(git_dir)
+            ref_file = common_dir / ref
+            if ref_file.is_file():
+                head = ref_file.read_text().strip()
+            else:
+                head = _lookup_packed_refs(common_dir, ref)
+    except (OSError, UnicodeDecodeError):
+        return None
+    
+    if head and OID_RE.fullmatch(head):
+        return head
+    return None
+
+
+def _needs_git_commit(repo) -> bool:
+    """Whether `git commit` would do something a pygit2 commit can't.
+    
+    That is running hooks, signing, taking author/committer details from
+    the environment, or finishing a merge, cherry-pick or revert (extra
+    parents, MERGE_MSG cleanup); in those cases the commit has to go through git.
+    """
+    if repo.state() != REPOSITORY_STATE_NONE:
+        return True
+    
+    if any(name in os.environ for name in COMMIT_ENV_OVERRIDES):
+        return True
+    
+    config = repo.config
+    # A custom hooks directory may hold anything, so don't try to inspect it
+    if "core.hooksPath" in config:
+        return True
+    try:
+        if config.get_bool("commit.gpgsign"):
+            return True
+    except (KeyError, pygit2.GitError):
+        pass
+    
+    # Linked worktrees share the main repository's hooks
+    hooks_dir = _common_dir(Path(repo.path)) / "hooks"
+    return any(
+        (hooks_dir / hook).exists()
+        for hook in ("pre-commit", "prepare-commit-msg", "commit-msg", "post-commit")
+    )
+
+
+def _pygit2_diff(repo, staged: bool):
+    """Diff staged (index vs HEAD) or unstaged (workdir vs index) changes."""
+    if staged:
+        return repo.diff('HEAD', cached=True)
+    return repo.diff()
+
+
+def _under_path(path: str, rel_path: Optional[str]) -> bool:
+    return not rel_path or path == rel_path or path.startswith(rel_path + '/')
+
+
+def _name_status_lines(entries: List[Tuple[str, str, Optional[str]]]) -> str:
+    """Format (status, path, old_path) entries as JSON lines."""
+    lines = []
+    for status, path, old_path in entries:
+        entry = {"status": status, "path": path}
+        if old_path:
+            entry["old_path"] = old_path
+        lines.append(json.dumps(entry))
+    return "\n".join(lines)
+
+
+def _parse_name_status(output: str) -> List[Tuple[str, str, Optional[str]]]:
+    """Parse `git diff --name-status -z` into (status, path, old_path) entries."""
+    fields = output.split('\0')
+    entries = []
+    i = 0
+    while i + 1 < len(fields):
+        status = fields[i]
+        # Renames and copies list the old path, then the new one
+        if status[:1] in ('R', 'C'):
+            entries.append((status[0], fields[i + 2], fields[i + 1]))
+            i += 3
+        else:
+            entries.append((status, fields[i + 1], None))
+            i += 2
+    return entries
+
+
+def _format_shortstat(files: int, insertions: int, deletions: int) -> str:
+    """Format counts the way `git diff --shortstat` does."""
+    summary = f"{files} file{'s' if files != 1 else ''} changed"
+    if insertions:
+        summary += f", {insertions} insertion{'s' if insertions != 1 else ''}(+)"
+    if deletions:
+        summary += f", {deletions} deletion{'s' if deletions != 1 else ''}(-)"
+    return summary
+
+
+def _parse_shortstat(shortstat: str) -> Tuple[int, int]:
+    """Return (files changed, lines changed) from `git diff --shortstat` output."""
+    match = SHORTSTAT_RE.search(shortstat)
+    if not match:
+        return 0, 0
+    files, insertions, deletions = (int(n or 0) for n in match.groups())
+    return files, insertions + deletions
+
+
+def _diff_too_large(files: int, changed_lines: int) -> bool:
+    return files > DIFF_MAX_FILES or changed_lines > DIFF_MAX_CHANGED_LINES
+
+
+def _too_large_message(shortstat: str) -> str:
+    return (
+        f"{shortstat.strip()}\n\n"
+        f"Diff too large to show in full (limits: {DIFF_MAX_FILES} files, "
+        f"{DIFF_MAX_CHANGED_LINES} changed lines). "
+        f"Use git_diff(file_path=...) to see individual files."
+    )
+
+
+def _truncate_diff(output: str, max_lines: int, note: str = DIFF_TRUNCATED_NOTE) -> str:
+    """Cut the diff to max_lines lines, noting the truncation."""
+    lines = output.split('\n', max_lines)
+    if len(lines) <= max_lines:
+        return output
+    return '\n'.join(lines[:max_lines]) + note
+
+
+def _stream_diff(cmd: List[str], cwd: str, env: dict, max_lines: int,
+                 note: str = DIFF_TRUNCATED_NOTE) -> Tuple[int, str, str]:
+    """Run a diff command, reading at most max_lines lines or DIFF_MAX_BYTES.
+    
+    The process is terminated once either limit is hit, and killed if it runs
+    longer than DIFF_TIMEOUT seconds (raising TimeoutExpired). Returns
+    (returncode, output, stderr).
+    """
+    # stderr goes to a file so a chatty git can't block on a full pipe
+    # while we're still reading stdout
+    with tempfile.TemporaryFile() as err_file:
+        proc = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=err_file,
+            text=True
+        )
+        # Reading stdout blocks, so the deadline is enforced from a timer thread
+        timed_out = threading.Event()
+        
+        def expire():
+            timed_out.set()
+            proc.kill()
+        
+        timer = threading.Timer(DIFF_TIMEOUT, expire)
+        timer.start()
+        lines = []
+        size = 0
+        truncated = False
+        try:
+            for line in proc.stdout:
+                if len(lines) >= max_lines or size >= DIFF_MAX_BYTES:
+                    truncated = True
+                    proc.terminate()
+                    break
+                lines.append(line)
+                size += len(line)
+        finally:
+            proc.stdout.close()
+            try:
+                proc.wait(timeout=DIFF_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+                raise
+            finally:
+                timer.cancel()
+        
+        if timed_out.is_set() and not truncated:
+            raise subprocess.TimeoutExpired(cmd, DIFF_TIMEOUT)
+        
+        stderr = ""
+        if not truncated:
+            err_file.seek(0)
+            stderr = err_file.read().decode("utf-8", errors="replace")
+    
+    output = "".join(lines).strip()
+    if truncated:
+        return 0, output + note, stderr
+    return proc.returncode, output, stderr
 
 
 def register_tools(registry, git_root):
@@ -23,12 +389,48 @@ def register_tools(registry, git_root):
     parent_module = sys.modules['__main__']
     validate_path = parent_module.validate_path
     
+    # Bound once for the closures below
+    from subprocess import run, TimeoutExpired
+    cwd = str(git_root)
+    
+    # Agents touch the same few files repeatedly; skip re-resolving them.
+    # A symlink retargeted mid-session keeps its old resolution, which was
+    # valid when cached. Failures raise, so lru_cache never keeps them.
+    @functools.lru_cache(maxsize=1024)
+    def resolve_valid_path(path: str) -> Tuple[Path, str]:
+        file_path = validate_path(path)
+        return file_path, str(file_path.relative_to(git_root))
+    
+    def resolve_path(path: str) -> Tuple[Optional[Path], str]:
+        """Validate a path; returns it resolved and relative to git_root.
+        
+        A rejected or unresolvable path (e.g. a symlink loop) gives
+        (None, reason) rather than raising, and is checked again next time.
+        """
+        try:
+            return resolve_valid_path(path)
+        except (ValueError, OSError, RuntimeError) as e:
+            return None, str(e)
+    
+    # Opened once and reused by every call; None means use the git CLI
+    repo = open_repository(git_root)
+    staging = DeferredIndex(repo) if repo is not None else None
+    
+    def flush_index():
+        """Write pending staged changes before git itself reads the index."""
+        if staging is not None:
+            staging.flush()
+    
+    # Read-only commands must not refresh the index (and take index.lock)
+    read_only_env = {**os.environ, "GIT_OPTIONAL_LOCKS": "0"}
+    
     @registry.register("git_add", """Adds files to git staging area.
 
 Parameters:
 - paths: file paths to add (can be a single path or multiple comma-separated paths)
 
 Adds the specified files to git staging area, ready for commit.
+Directories are not accepted; list the changed files explicitly.
 
 WORKFLOW: After ANY successful file modification (file_edit, file_move, file_delete, search_replace):
 1. Use git_add to stage the changed files
@@ -59,22 +461,46 @@ src/main.py, src/config.py
     def git_add(paths: str) -> str:
         """Add files to git staging area."""
         # Parse paths (can be comma-separated)
-        path_list = [p.strip() for p in paths.split(',')]
+        path_list = [p for p in (p.strip() for p in paths.split(',')) if p]
+        if not path_list:
+            return "❌ No paths provided"
         
         # Validate all paths first
         validated_paths = []
         for path in path_list:
+            file_path, rel_path = resolve_path(path)
+            if file_path is None:
+                return f"❌ Invalid path '{path}': {rel_path}"
+            if file_path.is_dir():
+                return f"❌ '{path}' is a directory. List the files to add explicitly."
+            validated_paths.append(rel_path)
+        
+        files_str = "\n  ".join(validated_paths)
+        
+        if staging is not None:
             try:
-                file_path = validate_path(path)
-                validated_paths.append(str(file_path.relative_to(git_root)))
-            except Exception as e:
-                return f"❌ Invalid path '{path}': {str(e)}"
+                with staging.lock:
+                    _pygit2_add(staging.load(), git_root, validated_paths)
+                    staging.changed()
+                return f"✓ Added to staging area:\n  {files_str}"
+            except (pygit2.GitError, OSError):
+                pass  # Let git report the problem
+        
+        flush_index()
         
         try:
-            # Run git add
-            result = subprocess.run(
-                ["git", "add"] + validated_paths,
-                cwd=str(git_root),
+            # Run git add; long path lists go through stdin to stay under argv limits
+            if len(validated_paths) > GIT_ADD_PATHSPEC_STDIN_MIN:
+                cmd = ["git", "--literal-pathspecs", "add", "--pathspec-from-file=-", "--pathspec-file-nul"]
+                stdin = "\0".join(validated_paths)
+            else:
+                cmd = ["git", "--literal-pathspecs", "add", "--"] + validated_paths
+                stdin = None
+            
+            result = run(
+                cmd,
+                cwd=cwd,
+                input=stdin,
                 capture_output=True,
                 text=True,
                 timeout=10
@@ -85,10 +511,9 @@ src/main.py, src/config.py
                 return f"❌ Git add failed:\n{error_msg}"
             
             # Show what was added
-            files_str = "\n  ".join(validated_paths)
             return f"✓ Added to staging area:\n  {files_str}"
             
-        except subprocess.TimeoutExpired:
+        except TimeoutExpired:
             return "❌ Error: Git add timed out after 10 seconds"
         except FileNotFoundError:
             return "❌ Error: git command not found. Is git installed?"
@@ -128,11 +553,27 @@ Add user authentication feature
         if not message.startswith("[llode]"):
             message = f"[llode] {message}"
         
+        # pygit2 commits don't run hooks, sign or read GIT_AUTHOR_*/GIT_COMMITTER_*;
+        # repositories that rely on any of those keep using git
+        if staging is not None and not _needs_git_commit(repo):
+            try:
+                with staging.lock:
+                    commit_id = _pygit2_commit(repo, staging.load(), message)
+                    # Write the index with the commit, so git status agrees with HEAD
+                    staging.flush()
+                if commit_id is None:
+                    return "❌ Nothing to commit. Use git_add to stage files first."
+                return f"✓ Commit created successfully\n  Hash: {commit_id[:8]}\n  Message: {message}"
+            except (pygit2.GitError, KeyError):
+                pass  # e.g. no user.name configured; let git report it
+        
+        flush_index()
+        
         try:
             # Run git commit
-            result = subprocess.run(
+            result = run(
                 ["git", "commit", "-m", message],
-                cwd=str(git_root),
+                cwd=cwd,
                 capture_output=True,
                 text=True,
                 timeout=10
@@ -145,20 +586,25 @@ Add user authentication feature
                     return "❌ Nothing to commit. Use git_add to stage files first."
                 return f"❌ Git commit failed:\n{error_msg}"
             
-            # Get commit hash
-            hash_result = subprocess.run(
-                ["git", "rev-parse", "HEAD"],
-                cwd=str(git_root),
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            # Get commit hash, asking git only if the refs can't be read directly
+            commit_oid = _read_head_oid(git_root)
+            if commit_oid is None:
+                hash_result = run(
+                    ["git", "--no-optional-locks", "rev-parse", "HEAD"],
+                    cwd=cwd,
+                    env=read_only_env,
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
+                if hash_result.returncode == 0:
+                    commit_oid = hash_result.stdout.strip()
             
-            commit_hash = hash_result.stdout.strip()[:8] if hash_result.returncode == 0 else "unknown"
+            commit_hash = commit_oid[:8] if commit_oid else "unknown"
             
             return f"✓ Commit created successfully\n  Hash: {commit_hash}\n  Message: {message}"
             
-        except subprocess.TimeoutExpired:
+        except TimeoutExpired:
             return "❌ Error: Git commit timed out"
         except FileNotFoundError:
             return "❌ Error: git command not found. Is git installed?"
@@ -170,54 +616,161 @@ Add user authentication feature
 Parameters:
 - staged: whether to show staged changes only (default: false)
 - file_path: optional specific file to diff (relative path)
+- max_lines: maximum number of diff lines to return (default: 2000)
+- mode: "patch" (default) for the diff itself, "names" for one JSON line
+  per changed file ({"status": "M", "path": ...}), or "empty" to only
+  check whether there are changes
+- detect_renames: report renamed files as renames (default: false). Off by
+  default because rename detection compares every added file against
+  every deleted one, which is slow on large changes; a rename then shows
+  as a deletion plus an addition
 
 Shows the git diff output. If staged=true, shows diff of staged changes (--cached).
 If staged=false, shows diff of unstaged changes.
-Optionally filter to a specific file path.""")
-    def git_diff(staged: str = "false", file_path: str = None) -> str:
+Optionally filter to a specific file path.
+Without file_path, diffs touching more than 50 files or 20000 lines return only a summary.
+Use mode="names" to decide which files to look at; it is much cheaper than a patch.""")
+    def git_diff(staged: str = "false", file_path: str = None,
+                 max_lines: str = str(DIFF_DEFAULT_MAX_LINES), mode: str = "patch",
+                 detect_renames: str = "false") -> str:
         """Show git diff of changes."""
+        if mode not in DIFF_MODES:
+            return f"❌ Invalid mode '{mode}'. Use one of: {', '.join(DIFF_MODES)}"
+        
+        try:
+            line_limit = int(max_lines)
+        except ValueError:
+            return f"❌ Invalid max_lines: {max_lines}"
+        
+        rel_path = None
+        if file_path:
+            resolved, rel_path = resolve_path(file_path)
+            if resolved is None:
+                return f"❌ Invalid file path: {rel_path}"
+        
+        is_staged = staged.lower() == "true"
+        find_renames = detect_renames.lower() == "true"
+        no_changes = "No staged changes to show" if is_staged else "No unstaged changes to show"
+        truncated_note = DIFF_TRUNCATED_FILE_NOTE if rel_path else DIFF_TRUNCATED_NOTE
+        has_changes = "There are staged changes" if is_staged else "There are unstaged changes"
+        
+        # A staged diff needs a HEAD commit to compare against
+        if staging is not None and not (is_staged and repo.head_is_unborn):
+            try:
+                with staging.lock:
+                    staging.load()
+                    diff = _pygit2_diff(repo, is_staged)
+                    if find_renames:
+                        diff.find_similar()
+                    # Filter on the deltas, which are cheap; patch text is only
+                    # generated for the files that match
+                    matching = [
+                        (i, delta) for i, delta in enumerate(diff.deltas)
+                        if _under_path(delta.new_file.path, rel_path)
+                    ]
+                    deltas = [delta for _, delta in matching]
+                    if mode == "patch":
+                        patches = [diff[i] for i, _ in matching]
+                
+                if mode == "empty":
+                    return has_changes if deltas else no_changes
+                if mode == "names":
+                    if not deltas:
+                        return no_changes
+                    return _name_status_lines([
+                        (d.status_char(), d.new_file.path,
+                         d.old_file.path if d.old_file.path != d.new_file.path else None)
+                        for d in deltas
+                    ])
+                
+                if not patches:
+                    return no_changes
+                
+                insertions = sum(patch.line_stats[1] for patch in patches)
+                deletions = sum(patch.line_stats[2] for patch in patches)
+                # A single path was asked for explicitly; max_lines still caps it
+                if not rel_path and _diff_too_large(len(patches), insertions + deletions):
+                    return _too_large_message(_format_shortstat(len(patches), insertions, deletions))
+                
+                output = "".join(patch.text for patch in patches).strip()
+                return _truncate_diff(output, line_limit, truncated_note)
+            except pygit2.GitError:
+                pass
+        
+        flush_index()
+        
         try:
             # Build git diff command
-            cmd = ["git", "diff"]
+            cmd = ["git", "--no-optional-locks", "diff"]
             
             # Add --cached flag if showing staged changes
-            if staged.lower() == "true":
+            if is_staged:
                 cmd.append("--cached")
             
+            cmd.append("-M" if find_renames else "--no-renames")
+            
             # Add specific file path if provided
-            if file_path:
-                try:
-                    validated_path = validate_path(file_path)
-                    rel_path = str(validated_path.relative_to(git_root))
-                    cmd.append("--")
-                    cmd.append(rel_path)
-                except Exception as e:
-                    return f"❌ Invalid file path: {str(e)}"
-            
-            # Run git diff
-            result = subprocess.run(
-                cmd,
-                cwd=str(git_root),
-                capture_output=True,
-                text=True,
-                timeout=30
+            pathspec = ["--", rel_path] if rel_path else []
+            
+            if mode == "empty":
+                # --quiet stops at the first difference
+                result = run(
+                    cmd + ["--quiet"] + pathspec,
+                    cwd=cwd,
+                    env=read_only_env,
+                    capture_output=True,
+                    text=True,
+                    timeout=30
+                )
+                if result.returncode not in (0, 1):
+                    error_msg = result.stderr or "Unknown error"
+                    return f"❌ Git diff failed:\n{error_msg}"
+                return has_changes if result.returncode == 1 else no_changes
+            
+            if mode == "names":
+                result = run(
+                    cmd + ["--name-status", "-z"] + pathspec,
+                    cwd=cwd,
+                    env=read_only_env,
+                    capture_output=True,
+                    text=True,
+                    timeout=30
+                )
+                if result.returncode != 0:
+                    error_msg = result.stderr or "Unknown error"
+                    return f"❌ Git diff failed:\n{error_msg}"
+                entries = _parse_name_status(result.stdout)
+                return _name_status_lines(entries) if entries else no_changes
+            
+            # Size a whole-tree diff first so a huge one never gets loaded.
+            # A single path was asked for explicitly; max_lines still caps it
+            if not rel_path:
+                stat_result = run(
+                    cmd + ["--shortstat"],
+                    cwd=cwd,
+                    env=read_only_env,
+                    capture_output=True,
+                    text=True,
+                    timeout=30
+                )
+                if stat_result.returncode == 0 and _diff_too_large(*_parse_shortstat(stat_result.stdout)):
+                    return _too_large_message(stat_result.stdout)
+            
+            # Run git diff, reading no more than we'll return
+            returncode, output, stderr = _stream_diff(
+                cmd + pathspec, cwd, read_only_env, line_limit, truncated_note
             )
             
-            if result.returncode != 0:
-                error_msg = result.stderr or "Unknown error"
+            if returncode != 0:
+                error_msg = stderr or "Unknown error"
                 return f"❌ Git diff failed:\n{error_msg}"
             
-            output = result.stdout.strip()
-            
             if not output:
-                if staged.lower() == "true":
-                    return "No staged changes to show"
-                else:
-                    return "No unstaged changes to show"
+                return no_changes
             
             return output
             
-        except subprocess.TimeoutExpired:
+        except TimeoutExpired:
             return "❌ Error: Git diff timed out after 30 seconds"
         except FileNotFoundError:
             return "❌ Error: git command not found. Is git installed?"
@@ -4,7 +4,7 @@ Todo management tool.
 Provides task tracking and todo list management.
 
 Dependencies:
-- None (uses stdlib only)
+- orjson (optional, faster validation of written todo lists)
 
 Description:
 Built-in todo list system for tracking complex multi-step tasks.
@@ -12,20 +12,69 @@ Stores todos in .llode/todo.json in the project directory.
 """
 
 import json
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# What todo_read returns before any list has been written
+EMPTY_TODO = json.dumps({"tasks": []}, indent=2)
+
+
+def _read_utf8(path, size: int) -> str:
+    """Read a small file with plain os calls; size is the expected length."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        chunks = []
+        # Normally one read returns everything; loop in case the file grew
+        while True:
+            chunk = os.read(fd, max(size, 4096))
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    return b"".join(chunks).decode('utf-8')
+
+
+def _write_bytes(fd: int, data: bytes):
+    """Write data to an open file descriptor with plain os calls, then close it."""
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 
 def register_tools(registry, git_root):
     """Register todo management tools."""
     
+    todo_path = git_root / ".llode" / "todo.json"
+    validate_json = orjson.loads if orjson is not None else json.loads
+    
+    # Last read contents, keyed by (mtime_ns, size) of the file
+    read_cache = {'key': None, 'data': None}
+    
     @registry.register("todo_read", """Reads the current todo list from .llode/todo.json.
 
 Returns the current todo list or empty structure if none exists.""")
     def todo_read() -> str:
         """Read the todo list."""
-        todo_path = git_root / ".llode" / "todo.json"
-        if todo_path.exists():
-            return todo_path.read_text()
-        return json.dumps({"tasks": []}, indent=2)
+        try:
+            st = todo_path.stat()
+        except FileNotFoundError:
+            st = None
+        if st is not None:
+            key = (st.st_mtime_ns, st.st_size)
+            if read_cache['key'] != key:
+                read_cache.update(key=key, data=_read_utf8(todo_path, st.st_size))
+            return read_cache['data']
+        return EMPTY_TODO
 
     @registry.register("todo_write", """Writes/updates the todo list to .llode/todo.json.
 
@@ -42,8 +91,18 @@ Expected format:
 CRITICAL: Mark in_progress BEFORE starting work. Only mark completed when FULLY done.""")
     def todo_write(content: str) -> str:
         """Write/update the todo list to .llode/todo.json."""
-        json.loads(content)  # Validate JSON
-        todo_path = git_root / ".llode" / "todo.json"
+        validate_json(content)  # Validate JSON
         todo_path.parent.mkdir(exist_ok=True)
-        todo_path.write_text(content)
+        # Write to a temp file and swap it in, so readers never see a partial list
+        fd, tmp_path = tempfile.mkstemp(dir=todo_path.parent, prefix=f".{todo_path.name}.")
+        try:
+            _write_bytes(fd, content.encode('utf-8'))
+            os.replace(tmp_path, todo_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        read_cache['key'] = None
         return "Todo list updated successfully"
\ No newline at end of file
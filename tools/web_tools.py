@@ -10,12 +10,110 @@ Description:
 Fetches content from URLs for integrating external documentation or resources.
 """
 
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Maximum number of bytes read from a response body
+FETCH_MAX_BYTES = 2 * 1024 * 1024
+FETCH_CHUNK_SIZE = 64 * 1024
+
+# Cached responses past this total size are evicted least recently used
+# first, and entries unused for longer than the max age are dropped
+HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+HTTP_CACHE_MAX_AGE = 30 * 24 * 3600
+
+# Shared session so repeated fetches reuse pooled keep-alive connections.
+# Connection failures and throttling/gateway errors are retried (honouring
+# Retry-After); a read that timed out is not, as the request may have been
+# served. Once retries run out the last response goes to raise_for_status.
+_SESSION = requests.Session()
+_RETRY = Retry(total=2, read=0, backoff_factor=0.2,
+               status_forcelist=(429, 502, 503, 504), raise_on_status=False)
+_ADAPTER = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=_RETRY)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (compatible; LLM-CLI-Assistant/1.0)'
+})
+
+
+def _load_cached(cache_file: Path) -> Optional[dict]:
+    """Load a cached response, ignoring missing or corrupt entries."""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _store_cached(cache_file: Path, entry: dict):
+    """Write a cache entry atomically; caching is best effort."""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temp name, so concurrent fetches of one URL don't collide
+        fd, tmp_file = tempfile.mkstemp(dir=cache_file.parent, prefix=f".{cache_file.name}.")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            try:
+                os.unlink(tmp_file)
+            except FileNotFoundError:
+                pass
+            raise
+    except OSError:
+        pass
+
+
+def _touch_cached(cache_file: Path):
+    """Mark a cache entry as used; mtime doubles as the last-use time."""
+    try:
+        os.utime(cache_file)
+    except OSError:
+        pass
+
+
+def _prune_cache(cache_dir: Path, max_bytes: int = HTTP_CACHE_MAX_BYTES,
+                 max_age: float = HTTP_CACHE_MAX_AGE):
+    """Drop stale entries, then least recently used ones until the cache fits."""
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return
+    
+    cutoff = time.time() - max_age
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
 
 
 def register_tools(registry, git_root):
     """Register web-related tools."""
     
+    cache_dir = git_root / ".llode" / "http-cache"
+    
     @registry.register("fetch_url", """Fetches content from a URL.
 
 Parameters:
@@ -28,19 +126,59 @@ Returns the content from the URL. Supports HTTP and HTTPS.""")
             if not url.startswith(('http://', 'https://')):
                 raise ValueError("URL must start with http:// or https://")
             
-            response = requests.get(url, timeout=30, headers={
-                'User-Agent': 'Mozilla/5.0 (compatible; LLM-CLI-Assistant/1.0)'
-            })
-            response.raise_for_status()
-            
-            content_type = response.headers.get('content-type', '').lower()
+            # Revalidate cached responses with their ETag/Last-Modified
+            cache_file = cache_dir / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+            cached = _load_cached(cache_file)
+            headers = {}
+            if cached:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
             
-            if 'application/json' in content_type:
-                return response.text
-            elif 'text/' in content_type or 'application/xml' in content_type:
-                return response.text
-            else:
-                return f"Content-Type: {content_type}\nContent-Length: {len(response.content)} bytes\n\n(Binary or non-text content - first 500 chars):\n{response.text[:500]}"
+            # Stream the body so large responses are never fully buffered
+            with _SESSION.get(url, timeout=30, stream=True, headers=headers) as response:
+                if response.status_code == 304 and cached:
+                    _touch_cached(cache_file)
+                    return cached['content']
+                
+                response.raise_for_status()
+                
+                content_type = response.headers.get('content-type', '').lower()
+                
+                if ('application/json' in content_type or 'text/' in content_type
+                        or 'application/xml' in content_type):
+                    chunks = []
+                    total = 0
+                    for chunk in response.iter_content(FETCH_CHUNK_SIZE):
+                        chunks.append(chunk)
+                        total += len(chunk)
+                        if total > FETCH_MAX_BYTES:
+                            break
+                    
+                    body = b''.join(chunks)
+                    text = body[:FETCH_MAX_BYTES].decode(response.encoding or 'utf-8', errors='replace')
+                    if total > FETCH_MAX_BYTES:
+                        text += f"\n\n(Truncated at {FETCH_MAX_BYTES} bytes)"
+                    
+                    # Only worth caching if the server lets us revalidate
+                    etag = response.headers.get('etag')
+                    last_modified = response.headers.get('last-modified')
+                    if etag or last_modified:
+                        _store_cached(cache_file, {
+                            'url': url,
+                            'etag': etag,
+                            'last_modified': last_modified,
+                            'content': text,
+                        })
+                        _prune_cache(cache_dir)
+                    return text
+                else:
+                    # Only the first chunk is needed for a preview
+                    first_chunk = next(response.iter_content(FETCH_CHUNK_SIZE), b'')
+                    content_length = response.headers.get('content-length', 'unknown')
+                    preview = first_chunk.decode(response.encoding or 'utf-8', errors='replace')[:500]
+                    return f"Content-Type: {content_type}\nContent-Length: {content_length} bytes\n\n(Binary or non-text content - first 500 chars):\n{preview}"
             
         except requests.exceptions.Timeout:
             raise TimeoutError(f"Request timed out after 30 seconds: {url}")